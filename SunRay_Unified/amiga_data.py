@@ -3,17 +3,31 @@
 Данные и логика для работы с заводом Amiga
 """
 
+import asyncio
 import json
 import logging
 import os
 import aiohttp
-import ssl
-import certifi
 import re
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Tuple
+
+from async_cache import AsyncTTLCache, not_found_cache
+from http_client import call_upstream, get_breaker, get_session
 
 logger = logging.getLogger(__name__)
 
+# Время жизни кэша материалов модели (секунды)
+AMIGA_MATERIALS_TTL = int(os.getenv("AMIGA_MATERIALS_TTL", "300"))
+
+# Сколько ждать материалы модели для отметок наличия на клавиатуре вариантов (секунды)
+AMIGA_BADGES_TIMEOUT = float(os.getenv("AMIGA_BADGES_TIMEOUT", "3"))
+
+# Предзагрузка материалов при запуске бота
+AMIGA_PREFETCH_CONCURRENCY = int(os.getenv("AMIGA_PREFETCH_CONCURRENCY", "4"))
+AMIGA_PREFETCH_TIMEOUT = float(os.getenv("AMIGA_PREFETCH_TIMEOUT", "15"))    # на одну модель
+AMIGA_PREFETCH_DEADLINE = float(os.getenv("AMIGA_PREFETCH_DEADLINE", "45"))  # на всю предзагрузку
+
 # Основные категории штор с их ID
 CATEGORIES = {
     "Рулонные шторы": "rulon.json",
@@ -75,6 +89,91 @@ def normalize_material_name(name: str) -> str:
     
     return normalized
 
+def _material_name(item: Dict) -> str:
+    """Возвращает название материала из элемента ответа API"""
+    return item.get("material", {}).get("name", "")
+
+class MaterialIndex:
+    """Индекс материалов модели для быстрого поиска по названию
+
+    Строится один раз на каждый загруженный ответ API. Повторяет порядок
+    поиска make_api_request: при нескольких совпадениях возвращается первый
+    по порядку элемент ответа.
+    """
+
+    # Максимальное число запомненных результатов поиска по подстроке
+    MAX_MEMO_SIZE = 4096
+
+    def __init__(self, items: List[Dict]):
+        self.items = items
+        self._names = [normalize_material_name(_material_name(item)) for item in items]
+        self._exact: Dict[str, int] = {}       # {нормализованное название: позиция}
+        self._trigrams: Dict[str, List[int]] = {}  # {триграмма: позиции по возрастанию}
+        self._memo: Dict[Tuple[str, ...], Optional[int]] = {}
+
+        for pos, name in enumerate(self._names):
+            self._exact.setdefault(name, pos)
+            for gram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                self._trigrams.setdefault(gram, []).append(pos)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def find_exact(self, name: str) -> Optional[Dict]:
+        """Ищет материал с совпадающим нормализованным названием"""
+        pos = self._exact.get(normalize_material_name(name))
+        return self.items[pos] if pos is not None else None
+
+    def find_containing(self, part: str) -> Optional[Dict]:
+        """Ищет первый материал, нормализованное название которого содержит part"""
+        return self.find_containing_all(part)
+
+    def find_containing_all(self, *parts: str) -> Optional[Dict]:
+        """Ищет первый материал, нормализованное название которого содержит все parts"""
+        key = tuple(normalize_material_name(part) for part in parts)
+        if key in self._memo:
+            pos = self._memo[key]
+        else:
+            pos = self._find_containing_pos(key)
+            if len(self._memo) >= self.MAX_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = pos
+        return self.items[pos] if pos is not None else None
+
+    def _find_containing_pos(self, parts: Tuple[str, ...]) -> Optional[int]:
+        """Возвращает позицию первого названия, содержащего все parts"""
+        # Название содержит строку, только если в нем есть все ее триграммы
+        grams = {part[i:i + 3] for part in parts for i in range(len(part) - 2)}
+        if not grams:
+            # Короткие строки не дают триграмм - проверяем все названия
+            candidates = range(len(self._names))
+        else:
+            postings = []
+            for gram in grams:
+                positions = self._trigrams.get(gram)
+                if not positions:
+                    return None
+                postings.append(positions)
+            postings.sort(key=len)
+
+            candidates = set(postings[0])
+            for positions in postings[1:]:
+                candidates.intersection_update(positions)
+                if not candidates:
+                    return None
+            candidates = sorted(candidates)
+
+        return next((pos for pos in candidates if all(part in self._names[pos] for part in parts)), None)
+
+def get_availability_badge(availability: Optional[int]) -> str:
+    """Возвращает значок наличия по числовому коду (пустую строку, если код неизвестен)"""
+    badge_map = {
+        2: "🟢",
+        1: "🟡",
+        0: "🔴"
+    }
+    return badge_map.get(availability, "")
+
 def get_availability_status(availability: int) -> str:
     """Возвращает статус наличия по числовому коду"""
     status_map = {
@@ -158,6 +257,82 @@ def get_all_gofre_models() -> List[str]:
     """Возвращает список всех доступных моделей гофре"""
     return ["MIDI", "MAXI", "RUS"]
 
+async def fetch_model_materials(model_id: int) -> List[Dict]:
+    """Загружает список материалов модели из API Amiga"""
+    url = f"https://customizer.amigo.ru/api/models/{model_id}/materials"
+    logger.info(f"API URL: {url} (model_id={model_id})")
+
+    async def request() -> List[Dict]:
+        session = get_session()
+        async with session.get(
+            url,
+            timeout=aiohttp.ClientTimeout(total=10)
+        ) as response:
+            if response.status != 200:
+                logger.error(f"API ошибка: {response.status}")
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=response.status, message=f"Amiga API вернул HTTP {response.status}"
+                )
+            data = await response.json()
+            logger.info(f"API ответ получен, количество материалов: {len(data)}")
+            return data
+
+    return await call_upstream("amiga", request)
+
+async def load_model_index(model_id: int) -> MaterialIndex:
+    """Загружает материалы модели и строит по ним индекс"""
+    return MaterialIndex(await fetch_model_materials(model_id))
+
+# Кэш индексов материалов по model_id: устаревший индекс отдается сразу и обновляется в фоне
+materials_cache = AsyncTTLCache("amiga_materials", load_model_index, ttl=AMIGA_MATERIALS_TTL)
+
+def match_material(index: MaterialIndex, fabric: str, variant: str,
+                   same_fabric: bool = False) -> Tuple[Optional[Dict], bool]:
+    """Ищет материал в индексе модели: точное совпадение, затем по варианту, затем по ткани
+
+    same_fabric=True (для значков) принимает после точного совпадения только
+    материал, в названии которого есть и вариант, и ткань: вариант другой
+    ткани или другой вариант той же ткани не считается найденным.
+    Возвращает (найденный элемент или None, было ли совпадение точным).
+    """
+    result = index.find_exact(f"{fabric} {variant}".strip().lower())
+    if result:
+        return result, True
+    if same_fabric:
+        return index.find_containing_all(variant, fabric), False
+    result = index.find_containing(variant)
+    if result is None:
+        result = index.find_containing(fabric)
+    return result, False
+
+def get_stale_age(model_id: int) -> Optional[float]:
+    """Возвращает возраст кэша модели, если ответ нужно пометить как устаревший
+
+    Устаревшим считается кэш старше TTL при недоступном API
+    или старше двух TTL (фоновые обновления не удаются).
+    """
+    age = materials_cache.age(model_id)
+    if age is None or age < AMIGA_MATERIALS_TTL:
+        return None
+    if not get_breaker("amiga").is_closed or age >= 2 * AMIGA_MATERIALS_TTL:
+        return age
+    return None
+
+def find_material(index: MaterialIndex, fabric: str, variant: str) -> Optional[Dict]:
+    """Ищет материал в индексе модели и записывает результат в лог"""
+    search_name = f"{fabric} {variant}".strip().lower()
+    logger.info(f"Ищем совпадение: {search_name}")
+    result, exact = match_material(index, fabric, variant)
+
+    if result and exact:
+        logger.info(f"Найдено точное совпадение: {result['material']['name']}")
+    elif result:
+        logger.warning(f"Найдено частичное совпадение: {result['material']['name']}")
+    else:
+        logger.warning("Материал не найден в API")
+    return result
+
 async def make_api_request(category: str, fabric: str, variant: str, model_id: int = None) -> Optional[Dict]:
     """Выполняет API запрос к серверу Amiga"""
     logger.info(f"API запрос: category={category}, fabric={fabric}, variant={variant}")
@@ -166,63 +341,171 @@ async def make_api_request(category: str, fabric: str, variant: str, model_id: i
         if model_id is None:
             model_id = CATEGORY_IDS.get(category, 1)
         
-        url = f"https://customizer.amigo.ru/api/models/{model_id}/materials"
-        logger.info(f"API URL: {url} (model_id={model_id})")
-
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-            async with session.get(
-                url,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    logger.info(f"API ответ получен, количество материалов: {len(data)}")
-                    
-                    if not data:
-                        logger.warning(f"API ответ пустой! URL: {url}")
-                        return None
-
-                    # Ищем совпадение по названию
-                    search_name = f"{fabric} {variant}".strip().lower()
-                    search_name_norm = normalize_material_name(search_name)
-                    logger.info(f"Ищем совпадение: {search_name}")
-
-                    # Точное совпадение
-                    result = next(
-                        (item for item in data if normalize_material_name(item.get("material", {}).get("name", "")) == search_name_norm),
-                        None
-                    )
-
-                    if result:
-                        logger.info(f"Найдено точное совпадение: {result['material']['name']}")
-                        return result
-                    else:
-                        # Частичное совпадение по варианту
-                        variant_norm = normalize_material_name(variant)
-                        fabric_norm = normalize_material_name(fabric)
-                        
-                        partial = next(
-                            (item for item in data if variant_norm in normalize_material_name(item.get("material", {}).get("name", ""))),
-                            None
-                        )
-                        
-                        if not partial:
-                            # Пробуем по ткани
-                            partial = next(
-                                (item for item in data if fabric_norm in normalize_material_name(item.get("material", {}).get("name", ""))),
-                                None
-                            )
-                        
-                        if partial:
-                            logger.warning(f"Найдено частичное совпадение: {partial['material']['name']}")
-                            return partial
-                        
-                        logger.warning("Материал не найден в API")
-                        return None
-                else:
-                    logger.error(f"API ошибка: {response.status}")
-                    return None
+        not_found_key = (model_id, fabric, variant)
+        if not_found_cache.contains("amiga", not_found_key):
+            logger.info("Материал недавно не был найден в API, повторный поиск пропущен")
+            return None
+        
+        index = await materials_cache.get(model_id)
+        
+        if not index:
+            logger.warning(f"API ответ пустой! model_id={model_id}")
+            return None
+
+        result = find_material(index, fabric, variant)
+        if result is None:
+            not_found_cache.add("amiga", not_found_key)
+            return None
+
+        stale_age = get_stale_age(model_id)
+        if stale_age is not None:
+            # Поставщик недоступен: отдаем последние известные данные с их возрастом
+            logger.warning(f"Ответ из устаревшего кэша model_id={model_id}, возраст {stale_age:.0f} с")
+            result = {**result, "stale_age": stale_age}
+        return result
     except Exception as e:
         logger.error(f"Ошибка API запроса: {e}")
         return None
+
+async def make_batch_api_request(items: List[Tuple[str, str, str, Optional[int]]]) -> List[Optional[Dict]]:
+    """Ищет сразу несколько позиций (category, fabric, variant, model_id)
+
+    Позиции группируются по model_id: на каждую модель выполняется один запрос
+    (или берется кэш), все позиции модели ищутся в общем индексе. Недавно
+    не найденные позиции пропускаются, как в make_api_request.
+    Возвращает результаты в порядке позиций, None - если позиция не найдена.
+    """
+    model_ids = [
+        model_id if model_id is not None else CATEGORY_IDS.get(category, 1)
+        for category, _, _, model_id in items
+    ]
+    skipped = [
+        not_found_cache.contains("amiga", (model_id, fabric, variant))
+        for (_, fabric, variant, _), model_id in zip(items, model_ids)
+    ]
+    # Модели, все позиции которых недавно не были найдены, не запрашиваем
+    distinct_ids = list(dict.fromkeys(
+        model_id for model_id, skip in zip(model_ids, skipped) if not skip
+    ))
+    logger.info(f"Пакетный API запрос: позиций={len(items)}, моделей={len(distinct_ids)}, пропущено={sum(skipped)}")
+
+    indexes = await asyncio.gather(
+        *(materials_cache.get(model_id) for model_id in distinct_ids),
+        return_exceptions=True
+    )
+    index_by_model = dict(zip(distinct_ids, indexes))
+
+    results = []
+    for (category, fabric, variant, _), model_id, skip in zip(items, model_ids, skipped):
+        if skip:
+            results.append(None)
+            continue
+        index = index_by_model[model_id]
+        if isinstance(index, Exception):
+            logger.error(f"Ошибка API запроса model_id={model_id}: {index}")
+            results.append(None)
+        elif not index:
+            logger.warning(f"API ответ пустой! model_id={model_id}")
+            results.append(None)
+        else:
+            result = find_material(index, fabric, variant)
+            if result is None:
+                not_found_cache.add("amiga", (model_id, fabric, variant))
+            else:
+                stale_age = get_stale_age(model_id)
+                if stale_age is not None:
+                    result = {**result, "stale_age": stale_age}
+            results.append(result)
+    return results
+
+async def get_variant_badges(
+    category: str,
+    fabric: str,
+    variants: List[str],
+    model_id: int = None,
+    timeout: float = AMIGA_BADGES_TIMEOUT
+) -> List[str]:
+    """Возвращает значки наличия для всех вариантов полотна по одному ответу API
+
+    Если материалы модели не получены за timeout, возвращает пустые значки,
+    а загрузка продолжается в фоне и попадет в кэш.
+    """
+    if model_id is None:
+        model_id = CATEGORY_IDS.get(category, 1)
+
+    try:
+        index = await asyncio.wait_for(materials_cache.get(model_id), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Значки наличия: материалы model_id={model_id} не получены за {timeout} с")
+        return [""] * len(variants)
+    except Exception as e:
+        logger.error(f"Значки наличия: ошибка API запроса model_id={model_id}: {e}")
+        return [""] * len(variants)
+
+    badges = []
+    for variant in variants:
+        # Наличие другого варианта или другой ткани для значка не подходит: без совпадения значок пустой
+        item, _ = match_material(index, fabric, variant, same_fabric=True)
+        badges.append(get_availability_badge(item.get("material", {}).get("availability")) if item else "")
+    return badges
+
+def prefetch_model_materials(model_ids: List[int]) -> None:
+    """Запускает фоновую загрузку материалов моделей, которые скоро понадобятся"""
+    for model_id in model_ids:
+        materials_cache.prefetch(model_id)
+
+def get_all_model_ids() -> List[int]:
+    """Возвращает ID всех моделей, по которым бот запрашивает наличие"""
+    return sorted(set(CATEGORY_IDS.values()) | set(PLISSE_MODEL_IDS.values()))
+
+# Предзагрузки, продолжающиеся после срока prefetch_all_models (ссылки, чтобы задачи не удалил сборщик мусора)
+_background_prefetches = set()
+
+async def prefetch_all_models(
+    concurrency: int = AMIGA_PREFETCH_CONCURRENCY,
+    timeout: float = AMIGA_PREFETCH_TIMEOUT,
+    deadline: float = AMIGA_PREFETCH_DEADLINE
+) -> Dict[int, bool]:
+    """Заполняет кэш материалов всех моделей перед началом работы бота
+
+    Возвращает {model_id: загружена ли модель}. Одновременно выполняется
+    не больше concurrency загрузок. Загрузки, не уложившиеся в timeout или
+    deadline, и модели, ожидающие очереди к сроку, продолжают загружаться
+    в фоне и попадут в кэш позже.
+    """
+    model_ids = get_all_model_ids()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {model_id: False for model_id in model_ids}
+
+    async def prefetch(model_id: int) -> None:
+        async with semaphore:
+            # Место в очереди освобождается только после окончания загрузки,
+            # в том числе не уложившейся в timeout
+            fetch = asyncio.ensure_future(materials_cache.get(model_id))
+            try:
+                index = await asyncio.wait_for(asyncio.shield(fetch), timeout)
+                results[model_id] = True
+                logger.info(f"Предзагрузка model_id={model_id}: {len(index)} материалов")
+            except asyncio.TimeoutError:
+                logger.warning(f"Предзагрузка model_id={model_id}: превышено время ожидания {timeout} с, загрузка продолжается в фоне")
+                await asyncio.wait({fetch})
+                if not fetch.cancelled() and fetch.exception() is None:
+                    logger.info(f"Предзагрузка model_id={model_id}: загружена после ожидания")
+            except Exception as e:
+                logger.warning(f"Предзагрузка model_id={model_id}: ошибка {e}")
+
+    started = time.monotonic()
+    tasks = [asyncio.create_task(prefetch(model_id)) for model_id in model_ids]
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        _background_prefetches.add(task)
+        task.add_done_callback(_background_prefetches.discard)
+
+    loaded = sum(results.values())
+    logger.info(
+        f"Предзагрузка Amiga завершена за {time.monotonic() - started:.1f} с: "
+        f"{loaded}/{len(model_ids)} моделей"
+        + (f", продолжают загружаться в фоне: {len(pending)}" if pending else "")
+    )
+    # Копия: фоновые загрузки продолжают отмечать results
+    return dict(results)
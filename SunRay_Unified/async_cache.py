@@ -0,0 +1,176 @@
+"""
+Кэш результатов асинхронных запросов к заводам
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Время жизни записей «не найдено» (секунды)
+NOT_FOUND_CACHE_TTL = int(os.getenv("NOT_FOUND_CACHE_TTL", "120"))
+
+class AsyncTTLCache:
+    """Кэш значений по ключу с временем жизни (TTL)
+
+    Свежая запись отдается сразу. Устаревшая запись тоже отдается сразу,
+    а в фоне запускается ее обновление (stale-while-revalidate).
+    Загрузка выполняется только при отсутствии записи.
+
+    Одновременные загрузки одного ключа объединяются (single-flight):
+    все ожидающие получают результат или ошибку одного запроса.
+    """
+
+    def __init__(self, name: str, loader: Callable[[Hashable], Awaitable[Any]], ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self._loader = loader
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}  # {key: (value, fetched_at)}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "prefetches": 0, "refreshes": 0, "errors": 0}
+
+    async def get(self, key: Hashable) -> Any:
+        """Возвращает значение из кэша, при отсутствии загружает его"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                self._schedule_refresh(key)
+            return value
+
+        self.stats["misses"] += 1
+        try:
+            return await self._load(key)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+    def prefetch(self, key: Hashable) -> None:
+        """Запускает загрузку в фоне, если записи нет или она устарела"""
+        entry = self._entries.get(key)
+        if entry is None:
+            if key not in self._inflight:
+                task = self._start_load(key)
+                task.add_done_callback(lambda t: self._on_background_load(key, t, "prefetches"))
+        elif time.monotonic() - entry[1] >= self.ttl:
+            self._schedule_refresh(key)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Возвращает значение из кэша без загрузки (None, если записи нет)"""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Возвращает возраст записи в секундах (None, если записи нет)"""
+        entry = self._entries.get(key)
+        return time.monotonic() - entry[1] if entry is not None else None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Сохраняет значение, загруженное в обход кэша (например, при проверке сессии)"""
+        self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Удаляет запись по ключу или весь кэш"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def _load(self, key: Hashable) -> Any:
+        """Загружает значение, присоединяясь к уже идущей загрузке ключа"""
+        # shield: отмена одного ожидающего не должна отменять общую загрузку
+        return await asyncio.shield(self._start_load(key))
+
+    def _start_load(self, key: Hashable) -> asyncio.Task:
+        """Возвращает задачу загрузки ключа, создавая ее при необходимости"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return task
+
+        task = asyncio.create_task(self._fetch_and_store(key))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return task
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Убирает завершенную загрузку из списка текущих"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Помечаем ошибку как полученную, даже если ее никто не ждал
+            task.exception()
+
+    async def _fetch_and_store(self, key: Hashable) -> Any:
+        """Выполняет загрузку и сохраняет значение в кэш"""
+        value = await self._loader(key)
+        self._entries[key] = (value, time.monotonic())
+        return value
+
+    def _schedule_refresh(self, key: Hashable) -> None:
+        """Запускает фоновое обновление записи (не более одного на ключ)"""
+        if key in self._inflight:
+            return
+        task = self._start_load(key)
+        task.add_done_callback(lambda t: self._on_background_load(key, t, "refreshes"))
+
+    def _on_background_load(self, key: Hashable, task: asyncio.Task, counter: str) -> None:
+        """Учитывает результат фоновой загрузки, при ошибке остается старое значение"""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            self.stats[counter] += 1
+        else:
+            self.stats["errors"] += 1
+            logger.warning(f"Кэш {self.name}: не удалось загрузить {key} в фоне: {error}")
+
+class NegativeCache:
+    """Короткоживущий кэш ответов «не найдено»
+
+    Ключи хранятся по пространствам имен (заводам), для каждого
+    ведутся отдельные счетчики сохраненных и отданных из кэша промахов.
+    """
+
+    # При превышении этого размера из кэша удаляются истекшие записи
+    PURGE_SIZE = 10000
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._expires: Dict[Tuple[str, Hashable], float] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _counters(self, namespace: str) -> Dict[str, int]:
+        return self.stats.setdefault(namespace, {"not_found": 0, "served": 0})
+
+    def contains(self, namespace: str, key: Hashable) -> bool:
+        """Проверяет, что ключ недавно не был найден у поставщика"""
+        expires = self._expires.get((namespace, key))
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del self._expires[(namespace, key)]
+            return False
+        self._counters(namespace)["served"] += 1
+        return True
+
+    def add(self, namespace: str, key: Hashable) -> None:
+        """Запоминает, что ключ не найден у поставщика"""
+        now = time.monotonic()
+        if len(self._expires) >= self.PURGE_SIZE:
+            self._expires = {k: exp for k, exp in self._expires.items() if exp > now}
+        self._expires[(namespace, key)] = now + self.ttl
+        self._counters(namespace)["not_found"] += 1
+
+    def discard(self, namespace: str, key: Hashable) -> None:
+        """Удаляет ключ из кэша (например, после появления материала)"""
+        self._expires.pop((namespace, key), None)
+
+# Общий кэш промахов для всех заводов
+not_found_cache = NegativeCache(ttl=NOT_FOUND_CACHE_TTL)
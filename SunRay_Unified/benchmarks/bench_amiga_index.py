@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска материала Amiga: линейные проходы против MaterialIndex
+
+Ответ API имитируется по локальным JSON файлам (все категории и модели плиссе).
+Запуск: python benchmarks/bench_amiga_index.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amiga_data import (
+    CATEGORIES, MaterialIndex, get_all_plisse_models, load_json_data, load_plisse_data,
+    normalize_material_name,
+)
+
+def build_payload():
+    """Собирает список материалов в формате /api/models/{id}/materials и запросы к нему"""
+    catalog = {}
+    for category, filename in CATEGORIES.items():
+        data = load_json_data(filename) or {}
+        catalog.update(data.get(category, data))
+    for model in get_all_plisse_models():
+        data = load_plisse_data(model) or {}
+        catalog.update(data.get(model, {}))
+
+    payload = []
+    queries = []
+    for fabric, variants in catalog.items():
+        for variant in variants:
+            payload.append({"material": {"name": f"{fabric} {variant}", "availability": 2}})
+            queries.append((fabric, variant))
+    # Запросы, которые находятся только частично или не находятся вовсе
+    queries += [(fabric, "999 несуществующий") for fabric in list(catalog)[:50]]
+    queries += [("НЕСУЩЕСТВУЮЩАЯ", "999 несуществующий")] * 50
+    return payload, queries
+
+def find_linear(data, fabric, variant):
+    """Поиск в том виде, в котором он был в make_api_request до индекса"""
+    search_name_norm = normalize_material_name(f"{fabric} {variant}".strip().lower())
+    result = next(
+        (item for item in data if normalize_material_name(item.get("material", {}).get("name", "")) == search_name_norm),
+        None
+    )
+    if result:
+        return result
+    variant_norm = normalize_material_name(variant)
+    fabric_norm = normalize_material_name(fabric)
+    partial = next(
+        (item for item in data if variant_norm in normalize_material_name(item.get("material", {}).get("name", ""))),
+        None
+    )
+    if not partial:
+        partial = next(
+            (item for item in data if fabric_norm in normalize_material_name(item.get("material", {}).get("name", ""))),
+            None
+        )
+    return partial
+
+def find_indexed(index, fabric, variant):
+    """Поиск через MaterialIndex (как в make_api_request)"""
+    result = index.find_exact(f"{fabric} {variant}".strip().lower())
+    return result or index.find_containing(variant) or index.find_containing(fabric)
+
+def main():
+    payload, queries = build_payload()
+    print(f"Материалов в ответе: {len(payload)}, запросов: {len(queries)}")
+
+    started = time.perf_counter()
+    index = MaterialIndex(payload)
+    build_time = time.perf_counter() - started
+
+    # Результаты должны совпадать с линейным поиском
+    for fabric, variant in queries:
+        assert find_linear(payload, fabric, variant) is find_indexed(index, fabric, variant), (fabric, variant)
+
+    started = time.perf_counter()
+    for fabric, variant in queries:
+        find_linear(payload, fabric, variant)
+    linear_time = time.perf_counter() - started
+
+    # Новый индекс без запомненных результатов - как после загрузки ответа
+    index = MaterialIndex(payload)
+    started = time.perf_counter()
+    for fabric, variant in queries:
+        find_indexed(index, fabric, variant)
+    indexed_time = time.perf_counter() - started
+
+    print(f"Построение индекса:  {build_time * 1000:.2f} мс")
+    print(f"Линейный поиск:      {linear_time * 1000:.2f} мс ({linear_time / len(queries) * 1e6:.1f} мкс/запрос)")
+    print(f"Поиск по индексу:    {indexed_time * 1000:.2f} мс ({indexed_time / len(queries) * 1e6:.1f} мкс/запрос)")
+    print(f"Ускорение: x{linear_time / indexed_time:.0f}")
+
+if __name__ == "__main__":
+    main()
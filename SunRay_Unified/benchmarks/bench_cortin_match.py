@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска материала в снимке остатков Cortin: линейный проход против StockMatchIndex
+
+Снимок строится из benchmarks/fixtures/cortin_stocks.html, запросы - названия
+со страницы с измененным написанием (ё/е, регистр, пробелы, без артикула).
+Запуск: python benchmarks/bench_cortin_match.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cortin_data import parse_stock_page
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "cortin_stocks.html")
+
+def build_queries(snapshot):
+    """Собирает запросы с измененным написанием названий со страницы"""
+    queries = []
+    for material, stock_amount in snapshot.rows:
+        if stock_amount is None:
+            continue
+        queries.append(material.replace("ё", "е").replace("Ё", "Е"))
+        queries.append("  ".join(material.upper().split()))
+        words = material.split()
+        if len(words) > 2 and words[-1].isdigit():
+            queries.append(" ".join(words[:-1]))
+    queries += ["Несуществующая ткань 000"] * 50
+    return queries
+
+def find_linear(snapshot, material_name):
+    """Поиск в том виде, в котором он был в StockSnapshot.find_stock до индекса"""
+    if material_name in snapshot.stock:
+        return snapshot.stock[material_name]
+    name = material_name.lower()
+    for material, stock_amount in snapshot.rows:
+        row_material = material.lower()
+        if stock_amount is not None and (name in row_material or row_material in name):
+            return stock_amount
+    return None
+
+def main():
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        snapshot = parse_stock_page(f.read())
+    queries = build_queries(snapshot)
+
+    linear_found = sum(find_linear(snapshot, query) is not None for query in queries)
+    matches = [snapshot.match(query) for query in queries]
+    indexed_found = sum(match is not None for match in matches)
+    print(f"Материалов в снимке: {len(snapshot)}, запросов: {len(queries)}")
+    print(f"Найдено: линейно {linear_found}, по индексу {indexed_found}")
+    for query, match in list(zip(queries, matches))[2:5]:
+        print(f"  {query!r} -> {match}")
+
+    started = time.perf_counter()
+    for query in queries:
+        find_linear(snapshot, query)
+    linear_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for query in queries:
+        snapshot.match(query)
+    indexed_time = time.perf_counter() - started
+
+    print(f"Линейный поиск:      {linear_time * 1000:.2f} мс ({linear_time / len(queries) * 1e6:.1f} мкс/запрос)")
+    print(f"Поиск по индексу:    {indexed_time * 1000:.2f} мс ({indexed_time / len(queries) * 1e6:.1f} мкс/запрос)")
+
+if __name__ == "__main__":
+    main()
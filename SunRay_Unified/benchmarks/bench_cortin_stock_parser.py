@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора страницы остатков Cortin: BeautifulSoup против потокового StockPageParser
+
+Страница берется из benchmarks/fixtures/cortin_stocks.html (разметка страницы
+/mfg/stocks/materials с названиями материалов из каталога).
+Запуск: python benchmarks/bench_cortin_stock_parser.py
+"""
+
+import codecs
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from cortin_data import READ_CHUNK_SIZE, StockPageParser
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "cortin_stocks.html")
+ROUNDS = 10
+
+def parse_with_beautifulsoup(body: bytes):
+    """Разбор в том виде, в котором он был в get_fabric_stock_online до потокового парсера"""
+    soup = BeautifulSoup(body.decode("utf-8"), "html.parser")
+    has_login_form = soup.find("input", {"type": "password"}) is not None
+    has_auth_action = soup.find("form", {"action": lambda x: x and "/site/login" in x if x else False}) is not None
+    title = soup.find("title")
+    title_text = title.get_text().lower() if title else ""
+    has_auth_title = "авторизация" in title_text and "остатки" not in title_text
+    assert not (has_login_form or has_auth_action or has_auth_title)
+
+    rows = []
+    for tr in soup.find_all("tr", {"data-material": True}):
+        stock_amount = None
+        tds = tr.find_all("td")
+        if tds:
+            match = re.search(r"([\d\.,]+)", tds[-1].get_text(strip=True))
+            if match:
+                stock_amount = match.group(1)
+        rows.append((tr.get("data-material", ""), stock_amount))
+    return rows
+
+def parse_streaming(body: bytes):
+    """Разбор частями по READ_CHUNK_SIZE байт (как в _fetch_stock_snapshot)"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = StockPageParser()
+    for offset in range(0, len(body), READ_CHUNK_SIZE):
+        parser.feed(decoder.decode(body[offset:offset + READ_CHUNK_SIZE]))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.snapshot().rows
+
+def measure(parse, body: bytes):
+    """Возвращает лучшее время разбора и пиковое потребление памяти"""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        parse(body)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    with open(FIXTURE_PATH, "rb") as f:
+        body = f.read()
+
+    reference_rows = parse_with_beautifulsoup(body)
+    streaming_rows = parse_streaming(body)
+    # Результаты должны совпадать с разбором через BeautifulSoup
+    assert streaming_rows == reference_rows
+    print(f"Страница: {len(body) / 1024:.0f} КБ, материалов: {len(reference_rows)}")
+
+    soup_time, soup_peak = measure(parse_with_beautifulsoup, body)
+    stream_time, stream_peak = measure(parse_streaming, body)
+
+    print(f"BeautifulSoup:       {soup_time * 1000:.1f} мс, пик памяти {soup_peak / 1024:.0f} КБ")
+    print(f"StockPageParser:     {stream_time * 1000:.1f} мс, пик памяти {stream_peak / 1024:.0f} КБ")
+    print(f"Ускорение: x{soup_time / stream_time:.1f}, память: x{soup_peak / stream_peak:.1f} меньше")
+
+if __name__ == "__main__":
+    main()
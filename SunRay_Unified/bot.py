@@ -10,7 +10,7 @@ import re
 from typing import Dict, List, Optional
 from aiogram import Bot, Dispatcher, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto
-from aiogram.filters import CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -84,9 +84,21 @@ except Exception as e:
 # Константы для пагинации
 ITEMS_PER_PAGE = 10
 
+# Сколько полотен показывать в ответе на /need (ограничение длины сообщения Telegram)
+NEED_MAX_VARIANTS = 40
+
+# Количество и запрос в /need: "12 Лён", "12,5 м лен бежевый"
+NEED_QUERY_PATTERN = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*(?:м\.?|m\.?|метр\w*)?\s+(.+?)\s*$", re.IGNORECASE)
+
+# Сколько позиций принимает /order за один раз
+ORDER_MAX_ITEMS = 40
+
 # Множество для отслеживания пользователей, которые уже видели приветствие
 seen_users = set()
 
+# Устанавливается после прогрева кэшей (проверяется health check из другого потока)
+bot_ready = threading.Event()
+
 # Импорт данных Amigo
 from amiga_data import CATEGORIES, CATEGORY_IDS, PLISSE_MODEL_IDS
 
@@ -99,6 +111,93 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import inter_data
 
+# Общий HTTP-клиент для запросов к заводам
+import http_client
+
+def format_stale_note(stale_age: Optional[float]) -> str:
+    """Возвращает пометку о возрасте данных, если ответ взят из кэша при недоступном поставщике"""
+    if stale_age is None:
+        return ""
+    minutes = int(stale_age // 60)
+    age_text = f"{minutes} мин" if minutes < 60 else f"{minutes // 60} ч {minutes % 60} мин"
+    return f"\n⚠️ Поставщик недоступен, данные получены {age_text} назад"
+
+def format_match_note(stock_info: Dict) -> str:
+    """Возвращает пометку, если остаток найден по похожему названию материала"""
+    matched_material = stock_info.get('matched_material')
+    if not matched_material:
+        return ""
+    return f"\n🔎 По похожему названию: {matched_material} (совпадение {stock_info.get('match_confidence', 0):.0%})"
+
+def format_cortin_availability(stock_info: Dict) -> str:
+    """Возвращает наличие полотна Cortin по всем типам изделий"""
+    by_type = stock_info.get('by_type')
+    if not by_type:
+        return stock_info.get('availability', '❓ Нет данных') + format_stale_note(stock_info.get('stale_age'))
+    lines = [
+        f"\n• {product_type}: {info['availability']}{format_match_note(info)}"
+        for product_type, info in by_type.items()
+    ]
+    return "".join(lines) + format_stale_note(stock_info.get('stale_age'))
+
+def parse_need_query(args: Optional[str]) -> Optional[tuple]:
+    """Разбирает аргументы /need: возвращает (метры, запрос) или None"""
+    match = NEED_QUERY_PATTERN.match(args or "")
+    if not match:
+        return None
+    return float(match.group(1).replace(',', '.')), match.group(2)
+
+def format_need_answer(query: str, meters_needed: float, result: Dict) -> str:
+    """Формирует ответ на /need: полотна, которых хватает на нужное количество"""
+    if 'availability' in result:
+        return f"Склад: Cortin\n\n{result['availability']}"
+    if not result['checked']:
+        return f"Склад: Cortin\n\n🔍 Полотна по запросу «{query}» не найдены"
+    variants = result['variants']
+    text = f"Склад: Cortin\nНужно: {meters_needed:g} м, запрос: {query}\n"
+    if not variants:
+        text += f"\n❌ Ни одного из {result['checked']} полотен нет в таком количестве"
+    else:
+        text += f"\n✅ Хватает у {len(variants)} из {result['checked']}:"
+        text += "".join(f"\n• {name}: {meters:g} м" for name, meters in variants[:NEED_MAX_VARIANTS])
+        if len(variants) > NEED_MAX_VARIANTS:
+            text += f"\n… и еще {len(variants) - NEED_MAX_VARIANTS}"
+    return text + format_stale_note(result.get('stale_age'))
+
+def parse_order_lines(text: Optional[str]) -> tuple:
+    """Разбирает позиции /order: строки "Категория; Полотно; Вариант"
+
+    Возвращает ([(category, fabric, variant, None)], [строки с ошибками]).
+    """
+    categories = {category.lower(): category for category in CATEGORY_IDS}
+    items = []
+    errors = []
+    for line in (text or "").splitlines():
+        if not line.strip():
+            continue
+        parts = [part.strip() for part in line.split(";")]
+        category = categories.get(parts[0].lower()) if parts else None
+        if len(parts) != 3 or category is None or not parts[1] or not parts[2]:
+            errors.append(line.strip())
+            continue
+        items.append((category, parts[1], parts[2], None))
+    return items, errors
+
+def format_order_answer(items: List[tuple], results: List[Optional[Dict]], errors: List[str]) -> str:
+    """Формирует ответ на /order: наличие каждой позиции заказа"""
+    from amiga_data import get_availability_status
+    lines = ["Склад: Amigo\nНаличие по заказу:\n"]
+    for number, ((_, fabric, variant, _), result) in enumerate(zip(items, results), 1):
+        if result:
+            status = get_availability_status(result['material'].get('availability')) + format_stale_note(result.get('stale_age'))
+        else:
+            status = "❓ Не найдено"
+        lines.append(f"{number}. {fabric} {variant}: {status}")
+    if errors:
+        lines.append("\n⚠️ Не разобраны строки:")
+        lines.extend(f"• {line}" for line in errors)
+    return "\n".join(lines)
+
 def create_welcome_keyboard():
     """Создает клавиатуру экрана приветствия"""
     keyboard = [
@@ -134,26 +233,61 @@ def create_cortin_fabric_types_keyboard(fabric_types: List[str]):
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def create_cortin_fabric_by_type_keyboard(fabrics: List[Dict], page: int = 0):
-    """Создает клавиатуру с полотнами Cortin определенного типа (с пагинацией)"""
+def format_cortin_stock_badge(meters: Optional[float]) -> str:
+    """Возвращает значок остатка для кнопки полотна Cortin (пустую строку, если данных нет)"""
+    if meters is None:
+        return ""
+    if meters <= 0:
+        return "🔴 0 м"
+    return f"🟢 {meters:g} м"
+
+def has_cortin_stock(stock: Optional[List[Optional[float]]]) -> bool:
+    """Известны ли остатки хотя бы одного полотна (иначе остатки не загрузились)"""
+    return bool(stock) and any(meters is not None for meters in stock)
+
+def select_cortin_fabrics(count: int, stock: Optional[List[Optional[float]]], only_in_stock: bool) -> List[int]:
+    """Возвращает индексы полотен для показа (с фильтром "только в наличии")
+
+    Если остатки неизвестны, фильтр не применяется: показываются все полотна.
+    """
+    if not only_in_stock or not has_cortin_stock(stock):
+        return list(range(count))
+    return [idx for idx in range(count) if idx < len(stock) and stock[idx] is not None and stock[idx] > 0]
+
+def create_cortin_stock_toggle_button(only_in_stock: bool, callback_data: str):
+    """Создает кнопку переключения фильтра по наличию"""
+    return InlineKeyboardButton(
+        text="📋 Показать все" if only_in_stock else "✅ Только в наличии",
+        callback_data=callback_data
+    )
+
+def create_cortin_fabric_by_type_keyboard(fabrics: List[Dict], page: int = 0,
+                                          stock: Optional[List[Optional[float]]] = None,
+                                          only_in_stock: bool = False):
+    """Создает клавиатуру с полотнами Cortin определенного типа (с пагинацией и остатками)
+
+    stock - остатки полотен в метрах в порядке fabrics (None - без значков).
+    """
     keyboard = []
     
+    visible = select_cortin_fabrics(len(fabrics), stock, only_in_stock)
     start_idx = page * ITEMS_PER_PAGE
     end_idx = start_idx + ITEMS_PER_PAGE
-    page_fabrics = fabrics[start_idx:end_idx]
+    page_fabrics = visible[start_idx:end_idx]
     
     # Добавляем кнопки полотен
-    for i, fabric in enumerate(page_fabrics):
-        fabric_idx = start_idx + i
+    for fabric_idx in page_fabrics:
+        fabric = fabrics[fabric_idx]
         fabric_name = fabric.get('name', 'Без названия')
+        badge = format_cortin_stock_badge(stock[fabric_idx]) if stock and fabric_idx < len(stock) else ""
         keyboard.append([InlineKeyboardButton(
-            text=fabric_name,
+            text=f"{fabric_name} · {badge}" if badge else fabric_name,
             callback_data=f"cortin_fabric_final_{fabric.get('id', 0)}"
         )])
     
     # Добавляем навигацию
     nav_row = []
-    total_pages = (len(fabrics) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
+    total_pages = (len(visible) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
     
     if page > 0:
         nav_row.append(InlineKeyboardButton(
@@ -170,6 +304,10 @@ def create_cortin_fabric_by_type_keyboard(fabrics: List[Dict], page: int = 0):
     if nav_row:
         keyboard.append(nav_row)
     
+    # Фильтр можно включить, когда известны остатки, и выключить всегда
+    if only_in_stock or has_cortin_stock(stock):
+        keyboard.append([create_cortin_stock_toggle_button(only_in_stock, "cortin_instock_type")])
+    
     # Кнопки возврата
     keyboard.append([
         InlineKeyboardButton(text="🔙 К выбору типа ткани", callback_data="cortin_back_to_fabric_types"),
@@ -263,8 +401,8 @@ def create_fabric_keyboard(fabrics: List[str], page: int = 0):
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def create_variants_keyboard(variants: List[str], page: int = 0):
-    """Создает клавиатуру с вариантами полотна (с пагинацией)"""
+def create_variants_keyboard(variants: List[str], page: int = 0, badges: Optional[List[str]] = None):
+    """Создает клавиатуру с вариантами полотна (с пагинацией и значками наличия)"""
     keyboard = []
     
     start_idx = page * ITEMS_PER_PAGE
@@ -274,8 +412,9 @@ def create_variants_keyboard(variants: List[str], page: int = 0):
     # Добавляем кнопки вариантов
     for i, variant in enumerate(page_variants):
         variant_idx = start_idx + i
+        badge = badges[variant_idx] if badges and variant_idx < len(badges) else ""
         keyboard.append([InlineKeyboardButton(
-            text=variant,
+            text=f"{badge} {variant}" if badge else variant,
             callback_data=f"amiga_variant_{variant_idx}"
         )])
     
@@ -305,6 +444,56 @@ def create_variants_keyboard(variants: List[str], page: int = 0):
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+def get_amiga_model_id(category: str, fabric_name: str, fabric_to_model: Dict[str, str]) -> Optional[int]:
+    """Определяет model_id для плиссе (None - использовать ID категории)"""
+    model_id = None
+    if category in ["Шторы плиссе"]:  # Убрали "Шторы гофре"
+        model_name = fabric_to_model.get(fabric_name)
+        if model_name:
+            if category == "Шторы плиссе":
+                model_id = PLISSE_MODEL_IDS.get(model_name)
+            # elif category == "Шторы гофре":
+            #     from amiga_data import GOFRE_MODEL_IDS
+            #     model_id = GOFRE_MODEL_IDS.get(model_name)
+            logger.info(f"Для {category} {fabric_name} используем model_id={model_id} (модель {model_name})")
+    return model_id
+
+def load_plisse_fabrics() -> tuple:
+    """Загружает полотна всех моделей плиссе
+
+    Возвращает ({полотно: варианты}, {полотно: модель}).
+    """
+    from amiga_data import load_plisse_data, get_all_plisse_models
+    category_data = {}
+    fabric_to_model = {}
+    for model in get_all_plisse_models():
+        model_data = load_plisse_data(model)
+        if model_data and model in model_data:
+            for fabric_name in model_data[model].keys():
+                category_data[fabric_name] = model_data[model][fabric_name]
+                fabric_to_model[fabric_name] = model
+    return category_data, fabric_to_model
+
+def resolve_order_model_ids(items: List[tuple]) -> List[tuple]:
+    """Проставляет позициям /order model_id модели плиссе, как при выборе полотна в меню"""
+    if not any(category == "Шторы плиссе" for category, _, _, _ in items):
+        return items
+    _, fabric_to_model = load_plisse_fabrics()
+    # Полотно в заказе может быть набрано в другом регистре
+    fabrics = {fabric_name.lower(): fabric_name for fabric_name in fabric_to_model}
+    resolved = []
+    for category, fabric, variant, model_id in items:
+        fabric = fabrics.get(fabric.lower(), fabric) if category == "Шторы плиссе" else fabric
+        resolved.append((category, fabric, variant, get_amiga_model_id(category, fabric, fabric_to_model)))
+    return resolved
+
+async def get_amiga_variant_badges(data: Dict) -> List[str]:
+    """Возвращает значки наличия для вариантов выбранного полотна из состояния"""
+    from amiga_data import get_variant_badges
+    fabric_name = data['fabric']
+    model_id = get_amiga_model_id(data['category'], fabric_name, data.get('fabric_to_model', {}))
+    return await get_variant_badges(data['category'], fabric_name, data['variants'], model_id=model_id)
+
 def create_final_keyboard():
     """Создает финальную клавиатуру для Amigo"""
     keyboard = [
@@ -437,6 +626,22 @@ def create_cortin_fabric_by_letter_keyboard(fabrics: List[str], page: int = 0):
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+async def show_cortin_fabrics_by_type(callback: CallbackQuery, data: Dict, page: int = 0):
+    """Показывает полотна выбранного типа ткани со значками остатков"""
+    from cortin_data import get_fabrics_stock_meters
+    fabrics = data.get('fabrics', [])
+    only_in_stock = data.get('cortin_only_in_stock', False)
+    stock = await get_fabrics_stock_meters([fabric.get('name', '') for fabric in fabrics])
+    keyboard = create_cortin_fabric_by_type_keyboard(fabrics, page, stock, only_in_stock)
+    text = f"Склад: Cortin\n\nБуква: {data.get('selected_letter', '')}\nТип ткани: {data.get('selected_fabric_type', '')}\n"
+    if only_in_stock and not has_cortin_stock(stock):
+        text += "⚠️ Остатки сейчас недоступны, показаны все полотна\nВыберите полотно:"
+    elif only_in_stock and not select_cortin_fabrics(len(fabrics), stock, True):
+        text += "Нет полотен в наличии"
+    else:
+        text += "Выберите полотно:"
+    await callback.message.edit_text(text=text, reply_markup=keyboard)
+
 def create_cortin_final_keyboard():
     """Создает финальную клавиатуру для Cortin"""
     keyboard = [
@@ -536,20 +741,22 @@ def create_inter_fabric_names_keyboard(fabric_type: str, fabric_category: str, p
     return create_inter_fabric_categories_keyboard(fabric_type, page)
 
 def create_inter_colors_keyboard(fabric_type: str, fabric_category: str, fabric_name: str, page: int = 0):
-    """Создает клавиатуру с цветами тканей Inter"""
-    colors_data = inter_data.get_fabric_colors(fabric_type, fabric_category, fabric_name)
+    """Создает клавиатуру с цветами тканей Inter
+
+    Кнопки ссылаются на короткий ID товара: у полотна может быть
+    несколько товаров с одинаковым цветом.
+    """
+    colors_data = inter_data.get_color_names(fabric_type, fabric_name)
+    item_ids = inter_data.get_item_ids(fabric_type, fabric_name)
     
     keyboard = []
     start_idx = page * ITEMS_PER_PAGE
     end_idx = start_idx + ITEMS_PER_PAGE
-    page_colors = colors_data[start_idx:end_idx]
     
-    for i, item in enumerate(page_colors):
-        color = inter_data.extract_color_from_name(item.get('name', ''))
-        color_idx = start_idx + i
+    for color, item_id in zip(colors_data[start_idx:end_idx], item_ids[start_idx:end_idx]):
         keyboard.append([InlineKeyboardButton(
             text=color,
-            callback_data=f"inter_color_{color_idx}"
+            callback_data=f"inter_color_{item_id}"
         )])
     
     # Добавляем навигацию
@@ -830,6 +1037,40 @@ async def cmd_start(message: Message, state: FSMContext):
     
     await message.answer(text=welcome_text, reply_markup=create_welcome_keyboard())
 
+@dp.message(Command("order"))
+async def cmd_order(message: Message, command: CommandObject):
+    """Наличие сразу всех позиций заказа Amigo: по одному запросу на модель"""
+    items, errors = parse_order_lines(command.args)
+    if not items:
+        await message.answer(
+            "Укажите позиции заказа, по одной в строке:\n"
+            "/order\nРулонные шторы; Альфа; белый\nВертикальные; Лайн; серый"
+        )
+        return
+    if len(items) > ORDER_MAX_ITEMS:
+        await message.answer(f"За один раз можно проверить не больше {ORDER_MAX_ITEMS} позиций")
+        return
+    
+    from amiga_data import make_batch_api_request
+    items = resolve_order_model_ids(items)
+    results = await make_batch_api_request(items)
+    logger.info(f"Запрос /order: позиций {len(items)}, найдено {sum(result is not None for result in results)}")
+    await message.answer(format_order_answer(items, results, errors))
+
+@dp.message(Command("need"))
+async def cmd_need(message: Message, command: CommandObject):
+    """Полотна Cortin, остатка которых хватает на нужное количество: /need 12 Лён"""
+    parsed = parse_need_query(command.args)
+    if parsed is None:
+        await message.answer("Укажите количество в метрах и ткань, например: /need 12 Лён")
+        return
+    
+    meters_needed, query = parsed
+    from cortin_data import find_fabrics_with_stock
+    result = await find_fabrics_with_stock(query, meters_needed)
+    logger.info(f"Запрос /need: {meters_needed} м, {query}, подходит: {len(result.get('variants', []))}")
+    await message.answer(format_need_answer(query, meters_needed, result))
+
 @dp.callback_query(F.data == "start_bot")
 async def start_bot_handler(callback: CallbackQuery, state: FSMContext):
     """Обработчик кнопки '🚀 Начать' - переход к выбору завода"""
@@ -939,20 +1180,12 @@ async def process_amiga_category_selection(callback: CallbackQuery, state: FSMCo
         json_filename = CATEGORIES[selected_category]
         
         # Загружаем данные из JSON
-        from amiga_data import load_json_data, load_plisse_data, load_gofre_data, get_all_plisse_models, get_all_gofre_models
+        from amiga_data import load_json_data, load_gofre_data, get_all_gofre_models
         
         # Специальная обработка для плиссе и гофре
         if selected_category == "Шторы плиссе":
-            # Загружаем все модели плиссе
-            models = get_all_plisse_models()
-            category_data = {}
-            fabric_to_model = {}  # Маппинг полотна к модели
-            for model in models:
-                model_data = load_plisse_data(model)
-                if model_data and model in model_data:
-                    for fabric_name in model_data[model].keys():
-                        category_data[fabric_name] = model_data[model][fabric_name]
-                        fabric_to_model[fabric_name] = model
+            # Загружаем все модели плиссе (fabric_to_model - маппинг полотна к модели)
+            category_data, fabric_to_model = load_plisse_fabrics()
         # elif selected_category == "Шторы гофре":
         #     # Для гофре показываем выбор модели
         #     await state.update_data(
@@ -991,6 +1224,13 @@ async def process_amiga_category_selection(callback: CallbackQuery, state: FSMCo
             )
             return
         
+        # Заранее загружаем материалы моделей категории, чтобы к выбору варианта они были в кэше
+        from amiga_data import prefetch_model_materials
+        if fabric_to_model:
+            prefetch_model_materials([PLISSE_MODEL_IDS[model] for model in set(fabric_to_model.values()) if model in PLISSE_MODEL_IDS])
+        else:
+            prefetch_model_materials([CATEGORY_IDS.get(selected_category, 1)])
+        
         # Сохраняем данные в состоянии
         await state.update_data(
             category=selected_category,
@@ -1194,6 +1434,11 @@ async def process_amiga_fabric_selection(callback: CallbackQuery, state: FSMCont
             await callback.answer()
             return
         
+        # Материалы модели полотна: запускаем загрузку сразу, если ее еще нет в кэше
+        from amiga_data import prefetch_model_materials
+        model_id = get_amiga_model_id(data['category'], selected_fabric, data.get('fabric_to_model', {}))
+        prefetch_model_materials([model_id if model_id is not None else CATEGORY_IDS.get(data['category'], 1)])
+        
         # Сохраняем состояние
         await state.update_data(
             fabric=selected_fabric,
@@ -1202,8 +1447,9 @@ async def process_amiga_fabric_selection(callback: CallbackQuery, state: FSMCont
         )
         await state.set_state(AmigaStates.choosing_variant)
         
-        # Показываем варианты
-        keyboard = create_variants_keyboard(variants, 0)
+        # Показываем варианты со значками наличия (один запрос на всю модель)
+        badges = await get_amiga_variant_badges({**data, 'fabric': selected_fabric, 'variants': variants})
+        keyboard = create_variants_keyboard(variants, 0, badges)
         
         # Формируем текст с учетом модели для гофре
         # if data.get('category') == "Шторы гофре" and 'gofre_model' in data:
@@ -1249,7 +1495,8 @@ async def process_amiga_variant_selection(callback: CallbackQuery, state: FSMCon
             # Обработка пагинации
             page = int(callback.data.split("_")[3])
             await state.update_data(variant_page=page)
-            keyboard = create_variants_keyboard(variants, page)
+            badges = await get_amiga_variant_badges(data)
+            keyboard = create_variants_keyboard(variants, page, badges)
             await callback.message.edit_reply_markup(reply_markup=keyboard)
             await callback.answer()
             return
@@ -1273,18 +1520,7 @@ async def process_amiga_variant_selection(callback: CallbackQuery, state: FSMCon
         fabric_name = data['fabric']
         
         # Определяем model_id для плиссе и гофре
-        model_id = None
-        if category in ["Шторы плиссе"]:  # Убрали "Шторы гофре"
-            fabric_to_model = data.get('fabric_to_model', {})
-            model_name = fabric_to_model.get(fabric_name)
-            if model_name:
-                if category == "Шторы плиссе":
-                    from amiga_data import PLISSE_MODEL_IDS
-                    model_id = PLISSE_MODEL_IDS.get(model_name)
-                # elif category == "Шторы гофре":
-                #     from amiga_data import GOFRE_MODEL_IDS
-                #     model_id = GOFRE_MODEL_IDS.get(model_name)
-                logger.info(f"Для {category} {fabric_name} используем model_id={model_id} (модель {model_name})")
+        model_id = get_amiga_model_id(category, fabric_name, data.get('fabric_to_model', {}))
         
         # Выполняем API запрос
         from amiga_data import make_api_request, get_availability_status, make_absolute_url
@@ -1297,7 +1533,7 @@ async def process_amiga_variant_selection(callback: CallbackQuery, state: FSMCon
         
         if api_response:
             availability_code = api_response['material'].get('availability', 0)
-            availability_status = get_availability_status(availability_code)
+            availability_status = get_availability_status(availability_code) + format_stale_note(api_response.get('stale_age'))
             image_url = make_absolute_url(api_response['material'].get('image'))
             material_name = api_response['material'].get('name', f"{fabric_name} {selected_variant}")
         else:
@@ -1390,16 +1626,12 @@ async def process_cortin_fabric_type_page(callback: CallbackQuery, state: FSMCon
     try:
         page = int(callback.data.split("_")[4])
         data = await state.get_data()
-        fabrics = data.get('fabrics', [])
-        selected_fabric_type = data.get('selected_fabric_type', '')
         
         # Обновляем страницу
         await state.update_data(fabric_page=page)
         
         # Показываем полотна на новой странице
-        keyboard = create_cortin_fabric_by_type_keyboard(fabrics, page)
-        text = f"Склад: Cortin\n\nБуква: {data.get('selected_letter', '')}\nТип ткани: {selected_fabric_type}\nВыберите полотно:"
-        await callback.message.edit_text(text=text, reply_markup=keyboard)
+        await show_cortin_fabrics_by_type(callback, data, page)
         await callback.answer()
         
     except Exception as e:
@@ -1429,17 +1661,17 @@ async def process_cortin_fabric_type_selection(callback: CallbackQuery, state: F
             return
         
         # Сохраняем выбранный тип ткани и полотна
+        # Фильтр "только в наличии" включается заново для каждого типа ткани
         await state.update_data(
             selected_fabric_type=selected_fabric_type,
             fabrics=fabrics,
-            fabric_page=0
+            fabric_page=0,
+            cortin_only_in_stock=False
         )
         await state.set_state(CortinStates.choosing_fabric)
         
         # Показываем полотна выбранного типа
-        keyboard = create_cortin_fabric_by_type_keyboard(fabrics, 0)
-        text = f"Склад: Cortin\n\nБуква: {data.get('selected_letter', '')}\nТип ткани: {selected_fabric_type}\nВыберите полотно:"
-        await callback.message.edit_text(text=text, reply_markup=keyboard)
+        await show_cortin_fabrics_by_type(callback, await state.get_data(), 0)
         await callback.answer()
         
     except Exception as e:
@@ -1461,7 +1693,7 @@ async def process_cortin_fabric_selection(callback: CallbackQuery, state: FSMCon
         logger.info(f"Пользователь выбрал полотно Cortin: {selected_fabric}")
         
         # Получаем информацию о полотне
-        from cortin_data import find_fabric_by_name, get_fabric_stock_online
+        from cortin_data import find_fabric_by_name, get_fabric_stock_all_types
         fabric_info = find_fabric_by_name(selected_fabric)
         
         if not fabric_info:
@@ -1476,8 +1708,9 @@ async def process_cortin_fabric_selection(callback: CallbackQuery, state: FSMCon
         
         # Получаем данные о наличии
         try:
-            stock_info = await get_fabric_stock_online(selected_fabric, "Римские шторы", "День-Ночь")
-            availability = stock_info.get('availability', '❓ Нет данных')
+            # Наличие сразу по всем типам изделий, страницы загружаются одновременно
+            stock_info = await get_fabric_stock_all_types(selected_fabric)
+            availability = format_cortin_availability(stock_info)
         except Exception as e:
             logger.error(f"Ошибка получения наличия для {selected_fabric}: {e}")
             availability = "❓ Нет данных"
@@ -1522,7 +1755,7 @@ async def process_cortin_fabric_final_selection(callback: CallbackQuery, state:
         logger.info(f"Пользователь выбрал полотно Cortin с ID: {fabric_id}")
         
         # Получаем информацию о полотне по ID
-        from cortin_data import find_variant_by_id, get_fabric_stock_online
+        from cortin_data import find_variant_by_id, get_fabric_stock_all_types
         fabric_info = find_variant_by_id(fabric_id)
         
         if not fabric_info:
@@ -1538,8 +1771,9 @@ async def process_cortin_fabric_final_selection(callback: CallbackQuery, state:
         
         # Получаем данные о наличии
         try:
-            stock_info = await get_fabric_stock_online(selected_fabric, "Римские шторы", "День-Ночь")
-            availability = stock_info.get('availability', '❓ Нет данных')
+            # Наличие сразу по всем типам изделий, страницы загружаются одновременно
+            stock_info = await get_fabric_stock_all_types(selected_fabric)
+            availability = format_cortin_availability(stock_info)
         except Exception as e:
             logger.error(f"Ошибка получения наличия для {selected_fabric}: {e}")
             availability = "❓ Нет данных"
@@ -1584,20 +1818,32 @@ async def process_cortin_fabric_page(callback: CallbackQuery, state: FSMContext)
     try:
         page = int(callback.data.split("_")[3])
         data = await state.get_data()
-        fabrics = data.get('fabrics', [])
-        selected_fabric_type = data.get('selected_fabric_type', '')
         
         await state.update_data(fabric_page=page)
         
-        keyboard = create_cortin_fabric_by_type_keyboard(fabrics, page)
-        text = f"Склад: Cortin\n\nБуква: {data.get('selected_letter', '')}\nТип ткани: {selected_fabric_type}\nВыберите полотно:"
-        await callback.message.edit_text(text=text, reply_markup=keyboard)
+        await show_cortin_fabrics_by_type(callback, data, page)
         await callback.answer()
         
     except Exception as e:
         logger.error(f"Ошибка при навигации по страницам Cortin: {e}")
         await callback.answer("Произошла ошибка")
 
+@dp.callback_query(F.data == "cortin_instock_type")
+async def process_cortin_instock_toggle(callback: CallbackQuery, state: FSMContext):
+    """Переключает фильтр "только в наличии" и показывает список с первой страницы"""
+    try:
+        data = await state.get_data()
+        only_in_stock = not data.get('cortin_only_in_stock', False)
+        await state.update_data(cortin_only_in_stock=only_in_stock, fabric_page=0)
+        data['cortin_only_in_stock'] = only_in_stock
+        
+        await show_cortin_fabrics_by_type(callback, data, 0)
+        await callback.answer("Только полотна в наличии" if only_in_stock else "Все полотна")
+        
+    except Exception as e:
+        logger.error(f"Ошибка переключения фильтра наличия Cortin: {e}")
+        await callback.answer("Произошла ошибка")
+
 # Обработчики навигации для Amigo
 @dp.callback_query(F.data == "amiga_back_to_categories")
 async def amiga_back_to_categories(callback: CallbackQuery, state: FSMContext):
@@ -1669,7 +1915,8 @@ async def amiga_back_to_variants(callback: CallbackQuery, state: FSMContext):
     if 'variants' in data:
         await state.set_state(AmigaStates.choosing_variant)
         variants = data['variants']
-        keyboard = create_variants_keyboard(variants, data.get('variant_page', 0))
+        badges = await get_amiga_variant_badges(data)
+        keyboard = create_variants_keyboard(variants, data.get('variant_page', 0), badges)
         text = (f"Склад: Amigo\n\n"
                 f"Категория: {data['category']}\n"
                 f"Полотно: {data['fabric']}\n"
@@ -1991,25 +2238,17 @@ async def process_inter_color_selection(callback: CallbackQuery, state: FSMConte
             await callback.answer()
             return
         
-        # Обработка выбора цвета
-        color_idx = int(callback.data.split("_")[2])
-        colors_data = inter_data.get_fabric_colors(fabric_type, "", fabric_name)
+        # Обработка выбора цвета: в кнопке короткий ID товара
+        item_id = callback.data[len("inter_color_"):]
+        logger.info(f"Пользователь выбрал товар Inter: {item_id}")
         
-        if color_idx >= len(colors_data):
-            await callback.answer("Ошибка выбора цвета")
-            return
-            
-        selected_item = colors_data[color_idx]
-        selected_color = inter_data.extract_color_from_name(selected_item.get('name', ''))
-        logger.info(f"Пользователь выбрал цвет Inter: {selected_color}")
-        
-        await state.update_data(color=selected_color)
+        await state.update_data(item_id=item_id)
         await state.set_state(InterStates.final_selection)
         
         await callback.message.edit_text("🔄 Получаю информацию о товаре, пожалуйста подождите...")
         
         # Получаем информацию о ткани
-        fabric_info = await inter_data.get_fabric_info(fabric_type, "", fabric_name, selected_color)
+        fabric_info = inter_data.get_item_info(item_id)
         
         if not fabric_info:
             await callback.message.edit_text(
@@ -2217,13 +2456,64 @@ async def inter_back_to_colors(callback: CallbackQuery, state: FSMContext):
         )
     await callback.answer()
 
+@dp.startup()
+async def on_startup():
+    """Создает общий HTTP-клиент (если он еще не создан на этапе прогрева) и запускает проверку cookies Cortin"""
+    from cookie_health import cookie_health
+    await http_client.init_http_client()
+    cookie_health.start()
+
+async def warm_up():
+    """Прогревает соединения и кэш материалов Amiga до начала приема обновлений"""
+    from amiga_data import prefetch_all_models
+    from cookie_store import cortin_cookies
+    
+    # cookies Cortin перечитываются по SIGHUP (update_cookies_weekly.sh) без перезапуска бота
+    cortin_cookies.install_reload_signal(asyncio.get_running_loop())
+    await http_client.init_http_client()
+    await asyncio.gather(
+        http_client.warm_up_connections(),
+        prefetch_all_models()
+    )
+    bot_ready.set()
+    logger.info("✅ Бот готов к работе")
+
+@dp.shutdown()
+async def on_shutdown():
+    """Останавливает проверку cookies, закрывает общий HTTP-клиент и пул разбора страниц Cortin"""
+    from cookie_health import cookie_health
+    from cortin_data import shutdown_parse_executor
+    await cookie_health.stop()
+    await http_client.close_http_client()
+    shutdown_parse_executor()
+
 if __name__ == "__main__":
     from aiohttp import web
     import threading
     
     # Простой HTTP сервер для health check
     async def health_check(request):
-        return web.Response(text="Bot is running", status=200)
+        from cookie_health import cookie_health
+        status = cookie_health.status
+        if not bot_ready.is_set():
+            return web.json_response({"status": "warming_up"}, status=503)
+        return web.json_response({
+            "status": "running",
+            "cortin_cookies_valid": status["cortin_cookies_valid"],
+            "cortin_cookies_age_days": status["cortin_cookies_age_days"],
+        })
+    
+    async def metrics(request):
+        """Подробное состояние: проверка cookies по сессиям и разбор страниц Cortin"""
+        from cookie_health import cookie_health
+        from cortin_data import get_auth_failure_stats, get_parse_stats
+        return web.json_response({
+            "ready": bot_ready.is_set(),
+            **cookie_health.status,
+            "cookie_checks": cookie_health.stats,
+            "cortin_auth_failures": get_auth_failure_stats(),
+            "cortin_parse": get_parse_stats(),
+        })
     
     def start_health_server():
         import asyncio
@@ -2232,6 +2522,7 @@ if __name__ == "__main__":
             app = web.Application()
             app.router.add_get('/', health_check)
             app.router.add_get('/health', health_check)
+            app.router.add_get('/metrics', metrics)
             
             # Получаем порт из переменной окружения или используем 8000 по умолчанию
             port = int(os.environ.get('PORT', 8000))
@@ -2269,6 +2560,9 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"Ошибка при удалении webhook: {e}")
         
+        # Прогрев завершается полностью или по истечении AMIGA_PREFETCH_DEADLINE
+        await warm_up()
+        
         await dp.start_polling(bot)
     
     asyncio.run(main())
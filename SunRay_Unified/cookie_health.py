@@ -0,0 +1,148 @@
+"""
+Фоновая проверка cookies Cortin внутри бота (настройки - cookies_config.py)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from cookie_store import cortin_cookies, cortin_sessions
+from cookies_config import MONITORING, SCHEDULE
+from cortin_auth import refresh_session
+from cortin_data import check_session
+
+logger = logging.getLogger(__name__)
+
+def cron_interval_seconds(expression: str) -> float:
+    """Возвращает период повторения cron-выражения в секундах
+
+    Поддерживаются шаги в минутах и часах ("*/30 * * * *", "0 */6 * * *"),
+    фиксированное время - раз в сутки, с днем недели - раз в неделю.
+    """
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"Неверное cron-выражение: {expression}")
+    minute, hour, _, _, weekday = fields
+    if minute.startswith("*/"):
+        return int(minute[2:]) * 60
+    if minute == "*":
+        return 60
+    if hour.startswith("*/"):
+        return int(hour[2:]) * 3600
+    if hour == "*":
+        return 3600
+    return 7 * 86400 if weekday != "*" else 86400
+
+class CookieHealthDaemon:
+    """Проверяет cookies сессий Cortin по расписанию SCHEDULE["health_check"]
+
+    Сессия считается действующей, если недавно (за check_interval_hours)
+    вернула страницу остатков при обычной работе бота. Иначе страница
+    загружается для проверки (cortin_data.check_session), и снимок сразу
+    попадает в кэш остатков. Если включено auto_update_enabled, cookies
+    старше max_cookie_age_days обновляются входом на сайт (cortin_auth).
+    """
+
+    def __init__(self, monitoring: Dict = MONITORING, schedule: Dict = SCHEDULE):
+        self.interval = cron_interval_seconds(schedule["health_check"])
+        self.check_after = monitoring["check_interval_hours"] * 3600
+        self.max_age_days = monitoring["max_cookie_age_days"]
+        self.auto_update = monitoring["auto_update_enabled"]
+        self.notify = monitoring["notification_enabled"]
+        self._task: Optional[asyncio.Task] = None
+        # Последнее состояние; словарь подменяется целиком, его можно читать из потока health-сервера
+        self.status: Dict = {"cortin_cookies_valid": None, "cortin_cookies_age_days": None, "checked_at": None, "sessions": {}}
+        self.stats = {"checks": 0, "downloads": 0, "errors": 0}
+
+    def start(self) -> None:
+        """Запускает проверки в фоне (вызывается при старте бота)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Проверка cookies Cortin каждые {self.interval / 60:.0f} мин")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Ошибка проверки cookies Cortin: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def check(self) -> Dict:
+        """Проверяет все сессии и обновляет status"""
+        self.stats["checks"] += 1
+        age_days = self.get_cookies_age_days()
+        if self.auto_update and age_days is not None and age_days > self.max_age_days:
+            await self._relogin_all(f"cookies старше {self.max_age_days} дней")
+            age_days = self.get_cookies_age_days()
+
+        sessions = {}
+        for name, session in cortin_sessions.sessions().items():
+            recently_valid = session.last_success is not None and time.time() - session.last_success < self.check_after
+            if recently_valid and session.healthy:
+                valid = True
+            else:
+                self.stats["downloads"] += 1
+                try:
+                    valid = await check_session(name)
+                except Exception as e:
+                    # Сайт недоступен: о cookies ничего не известно
+                    logger.warning(f"Cortin: не удалось проверить сессию {name}: {e}")
+                    valid = None
+            sessions[name] = {
+                "valid": valid,
+                "last_success": self._format_time(session.last_success),
+                "last_auth_failure": self._format_time(session.last_auth_failure),
+            }
+
+        known = [info["valid"] for info in sessions.values() if info["valid"] is not None]
+        # Cookies действуют, если работает хотя бы одна сессия пула
+        valid = any(known) if known else None
+        if valid is False and self.notify:
+            logger.warning("⚠️ Cookies Cortin недействительны ни для одной сессии - требуется обновление")
+        if age_days is not None and age_days > self.max_age_days and self.notify:
+            logger.warning(f"⚠️ Cookies Cortin старше {self.max_age_days} дней ({age_days:.1f})")
+
+        self.status = {
+            "cortin_cookies_valid": valid,
+            "cortin_cookies_age_days": round(age_days, 1) if age_days is not None else None,
+            "checked_at": datetime.now().isoformat(timespec="seconds"),
+            "sessions": sessions,
+        }
+        return self.status
+
+    async def _relogin_all(self, reason: str) -> None:
+        logger.info(f"Cortin: обновление cookies входом на сайт ({reason})")
+        await asyncio.gather(*(refresh_session(name) for name in cortin_sessions.sessions()))
+
+    @staticmethod
+    def get_cookies_age_days() -> Optional[float]:
+        """Возвращает возраст cookies в днях (по updated_at файла или времени его изменения)"""
+        try:
+            updated_at = datetime.fromisoformat(cortin_cookies.updated_at).timestamp()
+        except (TypeError, ValueError):
+            try:
+                updated_at = os.stat(cortin_cookies.path).st_mtime
+            except OSError:
+                return None
+        return (time.time() - updated_at) / 86400
+
+    @staticmethod
+    def _format_time(timestamp: Optional[float]) -> Optional[str]:
+        return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+# Проверка cookies, запускаемая ботом
+cookie_health = CookieHealthDaemon()
@@ -0,0 +1,302 @@
+"""
+Хранилище cookies Cortin с перечитыванием файла без перезапуска бота
+и пул сессий (учетных записей) с оценкой их состояния
+"""
+
+import json
+import logging
+import os
+import signal
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Файл с cookies сессии Cortin
+CORTIN_COOKIES_FILE = os.getenv(
+    "CORTIN_COOKIES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cortin_cookies.json")
+)
+
+# Сессия выводится из ротации после стольких ответов страницей авторизации подряд
+SESSION_MAX_AUTH_FAILURES = int(os.getenv("CORTIN_SESSION_MAX_AUTH_FAILURES", "2"))
+# Через сколько секунд выведенная из ротации сессия пробуется снова
+SESSION_RETRY_AFTER = float(os.getenv("CORTIN_SESSION_RETRY_AFTER", "600"))
+# Вес нового замера в скользящем среднем времени ответа
+SESSION_LATENCY_ALPHA = 0.3
+# Сессии медленнее самой быстрой во столько раз получают запросы, только когда быстрые заняты
+SESSION_SLOW_FACTOR = float(os.getenv("CORTIN_SESSION_SLOW_FACTOR", "2"))
+
+# Имя сессии из ключа "cookies" файла
+DEFAULT_SESSION = "default"
+
+def get_file_sessions(data: Dict) -> Dict[str, Dict[str, str]]:
+    """Возвращает сессии из содержимого файла cookies: {имя: cookies}
+
+    Файл может содержать одну сессию ("cookies") и/или несколько ("sessions").
+    """
+    sessions = {}
+    if isinstance(data.get("cookies"), dict):
+        sessions[DEFAULT_SESSION] = data["cookies"]
+    for name, cookies in (data.get("sessions") or {}).items():
+        if isinstance(cookies, dict):
+            sessions[name] = cookies
+    return sessions
+
+def read_cookies_file(path: str = CORTIN_COOKIES_FILE) -> Dict:
+    """Читает файл cookies: {"cookies": {...}, "sessions": {имя: {...}}, "updated_at": "..."}"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not get_file_sessions(data):
+        raise ValueError(f"В файле {path} нет cookies")
+    return data
+
+def write_cookies_file(cookies: Dict[str, str], path: str = CORTIN_COOKIES_FILE, session: str = DEFAULT_SESSION) -> None:
+    """Атомарно записывает cookies сессии в файл
+
+    Новые значения дополняют уже сохраненные (например, _csrf остается),
+    остальные сессии файла не меняются. Файл пишется во временный файл
+    рядом и подменяется через os.replace, поэтому бот никогда не прочитает
+    его наполовину записанным.
+    """
+    try:
+        data = read_cookies_file(path)
+    except (OSError, ValueError):
+        data = {}
+    if session == DEFAULT_SESSION:
+        data["cookies"] = {**data.get("cookies", {}), **cookies}
+    else:
+        sessions = data.setdefault("sessions", {})
+        sessions[session] = {**sessions.get(session, {}), **cookies}
+    data["updated_at"] = datetime.now().isoformat()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".cookies-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class CookieStore:
+    """Текущие cookies сессий, перечитываются при изменении файла
+
+    Перед каждым запросом get_sessions() сверяет время изменения файла и
+    при необходимости загружает его заново. Если новый файл не читается,
+    остаются прежние cookies.
+    """
+
+    def __init__(self, path: str = CORTIN_COOKIES_FILE):
+        self.path = path
+        self._sessions: Dict[str, Dict[str, str]] = {}
+        self._mtime: Optional[float] = None
+        self.version = 0  # увеличивается при каждой загрузке файла
+        self.loaded_at: Optional[float] = None  # time.time() последней загрузки
+        self.updated_at: Optional[str] = None   # updated_at из файла
+        self.stats = {"reloads": 0, "errors": 0}
+        self.reload()
+
+    def get_sessions(self) -> Dict[str, Dict[str, str]]:
+        """Возвращает cookies всех сессий, перечитывая файл, если он изменился"""
+        if self._stat_mtime() != self._mtime:
+            self.reload()
+        return self._sessions
+
+    def get(self) -> Dict[str, str]:
+        """Возвращает cookies основной сессии (или первой из файла)"""
+        sessions = self.get_sessions()
+        return sessions.get(DEFAULT_SESSION) or next(iter(sessions.values()), {})
+
+    def reload(self) -> bool:
+        """Загружает cookies из файла, возвращает True при успехе"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            data = read_cookies_file(self.path)
+        except (OSError, ValueError) as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Не удалось загрузить cookies из {self.path}: {e}")
+            # Не пытаемся перечитывать тот же файл при каждом запросе
+            self._mtime = self._stat_mtime()
+            return False
+
+        # Словарь подменяется целиком: запросы видят либо старые, либо новые cookies
+        self._sessions = {
+            session: {name: str(value) for name, value in cookies.items()}
+            for session, cookies in get_file_sessions(data).items()
+        }
+        self._mtime = mtime
+        self.version += 1
+        self.loaded_at = time.time()
+        self.updated_at = data.get("updated_at")
+        self.stats["reloads"] += 1
+        logger.info(f"Cookies загружены из {self.path}, сессий: {len(self._sessions)} ({', '.join(self._sessions)})")
+        return True
+
+    def _stat_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def install_reload_signal(self, loop, signum: int = getattr(signal, "SIGHUP", None)) -> bool:
+        """Перечитывает файл по сигналу (по умолчанию SIGHUP: pkill -HUP -f bot.py)"""
+        if signum is None:
+            return False
+        try:
+            loop.add_signal_handler(signum, self.reload)
+        except (NotImplementedError, RuntimeError, ValueError) as e:
+            logger.warning(f"Обработчик сигнала перечитывания cookies не установлен: {e}")
+            return False
+        return True
+
+class CortinSession:
+    """Сессия Cortin в пуле и ее состояние"""
+
+    def __init__(self, name: str, cookies: Dict[str, str]):
+        self.name = name
+        self.cookies = cookies
+        self.auth_failures = 0               # ответов страницей авторизации подряд
+        self.latency: Optional[float] = None  # скользящее среднее времени ответа (секунды)
+        self.disabled_until = 0.0            # до этого момента сессия выведена из ротации
+        self.inflight = 0
+        self.last_used = 0.0
+        self.last_success: Optional[float] = None       # time.time() последнего ответа с остатками
+        self.last_auth_failure: Optional[float] = None  # time.time() последней страницы авторизации
+        self.stats = {"requests": 0, "auth_failures": 0}
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.disabled_until
+
+    def load_key(self) -> tuple:
+        """Ключ выбора сессии: меньше текущих запросов, затем давно не использованная"""
+        return (self.inflight, self.last_used)
+
+    def record_success(self, latency: float) -> None:
+        if not self.healthy or self.auth_failures:
+            logger.info(f"Сессия Cortin {self.name} снова работает")
+        self.auth_failures = 0
+        self.disabled_until = 0.0
+        self.last_success = time.time()
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += SESSION_LATENCY_ALPHA * (latency - self.latency)
+
+    def record_auth_failure(self) -> None:
+        self.last_auth_failure = time.time()
+        self.auth_failures += 1
+        self.stats["auth_failures"] += 1
+        if self.auth_failures >= SESSION_MAX_AUTH_FAILURES:
+            self.disabled_until = time.monotonic() + SESSION_RETRY_AFTER
+            logger.warning(
+                f"Сессия Cortin {self.name} не авторизована {self.auth_failures} раз подряд, "
+                f"выведена из ротации на {SESSION_RETRY_AFTER:.0f} с"
+            )
+
+class SessionPool:
+    """Пул сессий Cortin с ротацией и отключением неработающих
+
+    Запросы распределяются по очереди между исправными сессиями, время
+    ответа которых не больше SESSION_SLOW_FACTOR времени самой быстрой;
+    медленные сессии получают запросы, когда быстрые заняты. Сессия, которая несколько раз подряд получила
+    страницу авторизации, выводится из ротации на SESSION_RETRY_AFTER.
+    Сессии берутся из CookieStore; у сессии с новыми cookies состояние
+    сбрасывается.
+    """
+
+    def __init__(self, store: CookieStore):
+        self.store = store
+        self._sessions: Dict[str, CortinSession] = {}
+        self._version: Optional[int] = None
+
+    def _sync(self) -> None:
+        sessions = self.store.get_sessions()
+        if self.store.version == self._version:
+            return
+        synced = {}
+        for name, cookies in sessions.items():
+            current = self._sessions.get(name)
+            synced[name] = current if current is not None and current.cookies == cookies else CortinSession(name, cookies)
+        self._sessions = synced
+        self._version = self.store.version
+
+    def acquire(self, exclude: Iterable[str] = (), healthy_only: bool = False) -> Optional[CortinSession]:
+        """Выбирает сессию для запроса; после запроса вызывается release()
+
+        Если исправных сессий нет и healthy_only не задан, возвращается
+        сессия, которая раньше других вернется в ротацию (проверка, не
+        обновлены ли ее cookies). None - подходящих сессий нет.
+        """
+        self._sync()
+        excluded = set(exclude)
+        candidates = [session for session in self._sessions.values() if session.name not in excluded]
+        healthy = [session for session in candidates if session.healthy]
+        if healthy:
+            latencies = [session.latency for session in healthy if session.latency is not None]
+            fastest = min(latencies) if latencies else 0.0
+            fast = [
+                session for session in healthy
+                if session.latency is None or session.latency <= fastest * SESSION_SLOW_FACTOR
+            ]
+            session = min(fast, key=CortinSession.load_key)
+            if session.inflight:
+                # Быстрые сессии заняты: берем любую исправную с наименьшей очередью
+                session = min(healthy, key=CortinSession.load_key)
+        elif candidates and not healthy_only:
+            session = min(candidates, key=lambda s: s.disabled_until)
+        else:
+            return None
+        return self._lease(session)
+
+    def acquire_session(self, name: str) -> Optional[CortinSession]:
+        """Выбирает для запроса конкретную сессию (проверка ее cookies)"""
+        self._sync()
+        session = self._sessions.get(name)
+        return self._lease(session) if session is not None else None
+
+    def _lease(self, session: CortinSession) -> CortinSession:
+        session.inflight += 1
+        session.last_used = time.monotonic()
+        session.stats["requests"] += 1
+        return session
+
+    def sessions(self) -> Dict[str, CortinSession]:
+        """Возвращает сессии пула по именам"""
+        self._sync()
+        return dict(self._sessions)
+
+    def release(self, session: CortinSession, latency: Optional[float] = None, auth_failed: bool = False) -> None:
+        """Учитывает результат запроса: время ответа или страницу авторизации
+
+        Ошибки, не связанные с авторизацией, на оценку сессии не влияют.
+        """
+        session.inflight -= 1
+        if auth_failed:
+            session.record_auth_failure()
+        elif latency is not None:
+            session.record_success(latency)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Возвращает состояние сессий пула"""
+        self._sync()
+        return {
+            name: {
+                "healthy": session.healthy,
+                "auth_failures": session.auth_failures,
+                "latency_ms": round(session.latency * 1000) if session.latency is not None else None,
+                "inflight": session.inflight,
+                **session.stats,
+            }
+            for name, session in self._sessions.items()
+        }
+
+# Cookies сессий Cortin для всех запросов бота
+cortin_cookies = CookieStore()
+cortin_sessions = SessionPool(cortin_cookies)
@@ -19,7 +19,7 @@ TESTING = {
 
 # Пути к файлам
 PATHS = {
-    "cookies_file": "cortin_data.py",
+    "cookies_file": "cortin_cookies.json",
     "backup_file": "cookies_backup.json",
     "log_file": "cookies_monitor.log",
     "error_log": "cookies_errors.log"
@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 """
-Система мониторинга cookies и автоматического обновления
+Ручная проверка cookies (в работающем боте их проверяет cookie_health)
 """
 
+import asyncio
 import json
 import time
-import requests
 from datetime import datetime, timedelta
 import logging
 
+from cortin_data import CortinAuthError, fetch_snapshot_with_cookies
+from http_client import close_http_client
+from cookie_store import CORTIN_COOKIES_FILE, DEFAULT_SESSION, get_file_sessions, read_cookies_file
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -21,81 +25,44 @@ logging.basicConfig(
 
 class CookiesMonitor:
     def __init__(self):
-        self.cookies_file = "cortin_data.py"
-        self.test_url = "https://sale.cortin.ru/mfg/stocks/materials"
+        self.cookies_file = CORTIN_COOKIES_FILE
         self.backup_file = "cookies_backup.json"
         
     def load_current_cookies(self):
         """Загружает текущие cookies из файла"""
         try:
-            with open(self.cookies_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Извлекаем cookies из Python файла
-            import re
-            phpsessid_match = re.search(r'"PHPSESSID":\s*"([^"]*)"', content)
-            identity_match = re.search(r'"_identity":\s*"([^"]*)"', content)
-            
-            if phpsessid_match and identity_match:
-                return {
-                    'PHPSESSID': phpsessid_match.group(1),
-                    '_identity': identity_match.group(1)
-                }
-            return None
+            # Проверяется основная сессия (или первая из файла)
+            sessions = get_file_sessions(read_cookies_file(self.cookies_file))
+            cookies = sessions.get(DEFAULT_SESSION) or next(iter(sessions.values()))
+            return {
+                'PHPSESSID': cookies.get('PHPSESSID', ''),
+                '_identity': cookies.get('_identity', '')
+            }
         except Exception as e:
             logging.error(f"Ошибка загрузки cookies: {e}")
             return None
     
     def test_cookies_validity(self, cookies):
-        """Проверяет валидность cookies"""
+        """Проверяет валидность cookies загрузкой страницы остатков (так же, как бот)"""
         try:
-            response = requests.get(
-                self.test_url,
-                cookies=cookies,
-                timeout=10,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-                }
-            )
-            
-            if response.status_code != 200:
-                logging.warning(f"HTTP статус: {response.status_code}")
-                return False
-            
-            text = response.text
-            
-            # Проверяем наличие данных о материалах
-            has_data_material = 'data-material=' in text
-            has_table = '<table' in text.lower()
-            material_count = text.count('data-material=')
-            
-            # Проверяем заголовок страницы
-            title_success = False
-            title_start = text.find('<title>')
-            title_end = text.find('</title>')
-            if title_start != -1 and title_end != -1:
-                title = text[title_start+7:title_end].lower()
-                title_success = 'остатки' in title or 'материалы' in title
-            
-            # Проверяем признаки неудачной авторизации
-            has_login_form = 'type="password"' in text or 'action="/site/login"' in text
-            has_auth_redirect = 'авторизация' in text.lower() and 'остатки' not in text.lower()
-            
-            if has_login_form or has_auth_redirect:
-                logging.warning("Обнаружена форма авторизации или редирект")
-                return False
-            
-            # Успешная авторизация если есть данные и правильный заголовок
-            if has_data_material and has_table and title_success and material_count > 100:
-                logging.info(f"✅ Cookies валидны - найдено {material_count} материалов")
-                return True
-            else:
-                logging.warning(f"❌ Недостаточно данных: materials={material_count}, table={has_table}, title={title_success}")
-                return False
-                
+            material_count = asyncio.run(self._fetch_material_count(cookies))
+        except CortinAuthError as e:
+            logging.warning(f"❌ {e}")
+            return False
         except Exception as e:
             logging.error(f"Ошибка проверки cookies: {e}")
             return False
+        
+        logging.info(f"✅ Cookies валидны - найдено {material_count} материалов")
+        return True
+    
+    @staticmethod
+    async def _fetch_material_count(cookies):
+        try:
+            snapshot = await fetch_snapshot_with_cookies(cookies)
+            return len(snapshot)
+        finally:
+            await close_http_client()
     
     def save_backup(self, cookies):
         """Сохраняет backup cookies"""
@@ -0,0 +1,167 @@
+"""
+Вход на сайт Cortin без браузера: форма /site/login через aiohttp
+"""
+
+import asyncio
+import logging
+import os
+import time
+from html.parser import HTMLParser
+from typing import Dict, Optional
+
+import aiohttp
+from yarl import URL
+
+from cookie_store import DEFAULT_SESSION, cortin_cookies, write_cookies_file
+from http_client import get_ssl_context
+
+logger = logging.getLogger(__name__)
+
+# Адрес сайта (для проверки можно указать локальный сервер)
+CORTIN_BASE_URL = os.getenv("CORTIN_BASE_URL", "https://sale.cortin.ru")
+CORTIN_LOGIN_TIMEOUT = float(os.getenv("CORTIN_LOGIN_TIMEOUT", "20"))
+# Повторный вход не чаще, чем раз в столько секунд (чтобы не перебирать пароль при сбоях)
+CORTIN_LOGIN_MIN_INTERVAL = float(os.getenv("CORTIN_LOGIN_MIN_INTERVAL", "300"))
+
+LOGIN_PATH = "/site/login"
+# Без этих cookies сайт не отдает страницу остатков
+REQUIRED_COOKIES = ("PHPSESSID", "_identity")
+
+LOGIN_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+class CortinLoginError(Exception):
+    """Не удалось войти на сайт Cortin"""
+
+class LoginFormParser(HTMLParser):
+    """Извлекает CSRF-токен из формы входа (поле _csrf или meta csrf-token)"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.csrf_param = "_csrf"
+        self.csrf_token: Optional[str] = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta":
+            if attrs.get("name") == "csrf-param" and attrs.get("content"):
+                self.csrf_param = attrs["content"]
+            elif attrs.get("name") == "csrf-token" and attrs.get("content") and self.csrf_token is None:
+                self.csrf_token = attrs["content"]
+        elif tag == "input" and attrs.get("type") == "hidden" and attrs.get("name") == self.csrf_param:
+            # Токен формы предпочтительнее токена из meta
+            if attrs.get("value"):
+                self.csrf_token = attrs["value"]
+
+def parse_login_form(html: str) -> tuple:
+    """Возвращает (имя поля CSRF, токен) со страницы входа"""
+    parser = LoginFormParser()
+    parser.feed(html)
+    parser.close()
+    if not parser.csrf_token:
+        raise CortinLoginError("На странице входа не найден CSRF-токен")
+    return parser.csrf_param, parser.csrf_token
+
+async def login(username: str, password: str, base_url: str = CORTIN_BASE_URL,
+                timeout: float = CORTIN_LOGIN_TIMEOUT) -> Dict[str, str]:
+    """Входит на сайт и возвращает cookies новой сессии
+
+    Используется отдельная сессия aiohttp со своим хранилищем cookies,
+    чтобы cookies входа не попадали в общий пул соединений.
+    """
+    login_url = base_url.rstrip("/") + LOGIN_PATH
+    # unsafe: cookies сохраняются и для адресов по IP (локальный тестовый сервер)
+    cookie_jar = aiohttp.CookieJar(unsafe=True)
+    connector = aiohttp.TCPConnector(ssl=get_ssl_context())
+    async with aiohttp.ClientSession(
+        connector=connector, cookie_jar=cookie_jar, headers=LOGIN_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as session:
+        async with session.get(login_url) as resp:
+            if resp.status != 200:
+                raise CortinLoginError(f"Страница входа вернула HTTP {resp.status}")
+            csrf_param, csrf_token = parse_login_form(await resp.text())
+
+        form = {
+            csrf_param: csrf_token,
+            "LoginForm[username]": username,
+            "LoginForm[password]": password,
+            # Без rememberMe сайт не выдает долгоживущий _identity
+            "LoginForm[rememberMe]": "1",
+        }
+        async with session.post(login_url, data=form, headers={"Referer": login_url}, allow_redirects=False) as resp:
+            location = resp.headers.get("Location", "")
+            # Успешный вход - редирект не на страницу входа; иначе форма возвращается с ошибкой
+            if resp.status not in (301, 302, 303) or LOGIN_PATH in location:
+                raise CortinLoginError(f"Вход не выполнен: HTTP {resp.status}, неверный логин или пароль")
+
+        cookies = {name: morsel.value for name, morsel in cookie_jar.filter_cookies(URL(base_url)).items()}
+
+    missing = [name for name in REQUIRED_COOKIES if not cookies.get(name)]
+    if missing:
+        raise CortinLoginError(f"После входа нет cookies: {', '.join(missing)}")
+    return cookies
+
+def get_login_credentials(session_name: str = DEFAULT_SESSION) -> Optional[tuple]:
+    """Возвращает (логин, пароль) из переменных окружения
+
+    Основная сессия: CORTIN_USERNAME / CORTIN_PASSWORD,
+    остальные сессии пула: CORTIN_USERNAME_<ИМЯ> / CORTIN_PASSWORD_<ИМЯ>.
+    """
+    suffix = "" if session_name == DEFAULT_SESSION else f"_{session_name.upper()}"
+    username = os.getenv(f"CORTIN_USERNAME{suffix}")
+    password = os.getenv(f"CORTIN_PASSWORD{suffix}")
+    if not username or not password:
+        return None
+    return username, password
+
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+_last_attempt: Dict[str, float] = {}
+
+def _start_refresh(session_name: str) -> Optional[asyncio.Task]:
+    """Возвращает задачу входа для сессии (None - недавно уже пробовали)"""
+    task = _refresh_tasks.get(session_name)
+    if task is not None:
+        return task
+    last_attempt = _last_attempt.get(session_name)
+    if last_attempt is not None and time.monotonic() - last_attempt < CORTIN_LOGIN_MIN_INTERVAL:
+        return None
+    _last_attempt[session_name] = time.monotonic()
+    task = asyncio.create_task(_refresh(session_name))
+    _refresh_tasks[session_name] = task
+    task.add_done_callback(lambda t: _refresh_tasks.pop(session_name, None))
+    return task
+
+def schedule_refresh(session_name: str = DEFAULT_SESSION) -> None:
+    """Запускает вход для сессии в фоне"""
+    _start_refresh(session_name)
+
+async def refresh_session(session_name: str = DEFAULT_SESSION) -> bool:
+    """Входит заново и сохраняет cookies сессии в cortin_cookies.json
+
+    Одновременные вызовы ждут один вход; после попытки следующая
+    возможна не раньше чем через CORTIN_LOGIN_MIN_INTERVAL.
+    Возвращает True, если новые cookies сохранены.
+    """
+    task = _start_refresh(session_name)
+    if task is None:
+        return False
+    return await asyncio.shield(task)
+
+async def _refresh(session_name: str) -> bool:
+    credentials = get_login_credentials(session_name)
+    if credentials is None:
+        logger.warning(f"Cortin: нет логина и пароля для сессии {session_name}, автоматический вход невозможен")
+        return False
+    try:
+        cookies = await login(*credentials)
+        write_cookies_file(cookies, cortin_cookies.path, session=session_name)
+    except Exception as e:
+        logger.error(f"Cortin: не удалось войти (сессия {session_name}): {e}")
+        return False
+
+    cortin_cookies.reload()
+    logger.info(f"Cortin: выполнен вход, cookies сессии {session_name} обновлены")
+    return True
@@ -1,13 +1,22 @@
 import json
 import os
 import aiohttp
-import ssl
-import certifi
 import asyncio
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional
 from urllib.parse import urlencode
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+import codecs
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_cache import AsyncTTLCache, not_found_cache
+from cookie_store import cortin_sessions
+from cortin_auth import LOGIN_PATH, refresh_session, schedule_refresh
+from http_client import call_upstream, get_breaker, get_session, upstream_failure_group
+
+# Страница остатков материалов Cortin
+CORTIN_STOCKS_URL = "https://sale.cortin.ru/mfg/stocks/materials"
 
 # Загружаем данные Cortin
 def load_cortin_data():
@@ -29,6 +38,27 @@ def load_cortin_data():
 
 SHUTTERS, MATERIALS = load_cortin_data()
 
+def build_material_indexes(materials: List[Dict]) -> tuple:
+    """Строит словари поиска полотен: по ID, по названию и по типу ткани
+
+    При повторах сохраняется первое вхождение, как при поиске перебором.
+    """
+    variants_by_id: Dict[int, Dict] = {}
+    variants_by_name: Dict[str, Dict] = {}
+    variants_by_fabric: Dict[str, List[Dict]] = {}
+    for material in materials:
+        variants = material.get('variants', [])
+        if material.get('fabric'):
+            variants_by_fabric.setdefault(material['fabric'], variants)
+        for variant in variants:
+            if variant.get('id') is not None:
+                variants_by_id.setdefault(variant['id'], variant)
+            if variant.get('name'):
+                variants_by_name.setdefault(variant['name'], variant)
+    return variants_by_id, variants_by_name, variants_by_fabric
+
+VARIANTS_BY_ID, VARIANTS_BY_NAME, VARIANTS_BY_FABRIC = build_material_indexes(MATERIALS)
+
 # ID категорий "День и ночь" для API запросов
 # Используются все 4 ID одновременно, как в Amiga
 CORTIN_DAY_NIGHT_CATEGORY_IDS = [
@@ -38,94 +68,811 @@ CORTIN_DAY_NIGHT_CATEGORY_IDS = [
     "categoryId_for_petli"        # День и ночь на петлях
 ]
 
+# Заголовки для запросов к сайту Cortin (cookies - в cortin_cookies.json, см. cookie_store)
+CORTIN_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Referer": "https://sale.cortin.ru/"
+}
+
+# Категория страницы остатков и группа shutters.json, типы изделий которой запрашиваются вместе
+CORTIN_STOCK_CATEGORY = "Римские шторы"
+CORTIN_SHUTTER_GROUP = "Римская штора"
+DEFAULT_PRODUCT_TYPE = "День-Ночь"
+
+# Время жизни снимка страницы остатков (секунды)
+CORTIN_SNAPSHOT_TTL = int(os.getenv("CORTIN_SNAPSHOT_TTL", "300"))
+
+# Меньше строк на странице типа изделия по умолчанию бывает только без авторизации
+# (у остальных типов страница может быть короткой)
+MIN_STOCK_ROWS = 100
+
+def get_min_stock_rows(product_type: str) -> int:
+    """Возвращает минимум строк страницы остатков, ниже которого сессия считается не авторизованной"""
+    return MIN_STOCK_ROWS if product_type == DEFAULT_PRODUCT_TYPE else 0
+
+# Разбор HTML выполняется в отдельных потоках, чтобы не блокировать event loop
+CORTIN_PARSE_WORKERS = int(os.getenv("CORTIN_PARSE_WORKERS", "2"))
+_parse_executor = ThreadPoolExecutor(max_workers=CORTIN_PARSE_WORKERS, thread_name_prefix="cortin-parse")
+
+# Статистика разбора страниц остатков (время в секундах): разбор в потоках
+# и ожидание свободного потока пула
+parse_stats = {
+    "count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0,
+    "total_wait_seconds": 0.0, "max_wait_seconds": 0.0, "last_wait_seconds": 0.0,
+}
+
+# Размер части ответа, передаваемой потоковому парсеру (байты)
+READ_CHUNK_SIZE = 64 * 1024
+
+STOCK_AMOUNT_PATTERN = re.compile(r"([\d\.,]+)")
+
+# Сколько ждать остатки для значков на кнопках полотен (дальше - кнопки без значков)
+CORTIN_BADGES_TIMEOUT = float(os.getenv("CORTIN_BADGES_TIMEOUT", "3"))
+
+# Минимальная уверенность (0..1), с которой принимается похожее название материала
+CORTIN_MATCH_MIN_CONFIDENCE = float(os.getenv("CORTIN_MATCH_MIN_CONFIDENCE", "0.6"))
+
+NAME_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Слова названия вместе с дефисами: артикулы "9022-3", "V-04" и цвета "Серо-бежевый"
+KEY_TOKEN_PATTERN = re.compile(r"\w+(?:-\w+)*")
+
+# Начала слов-цветов: материалы одной ткани на странице остатков отличаются цветом или артикулом
+COLOR_STEMS = (
+    "бел", "беж", "сер", "черн", "сини", "синя", "сине", "голуб", "зелен", "желт", "красн",
+    "розов", "коричн", "бирюз", "сирен", "фиолет", "лилов", "молоч", "молок", "песо", "графит",
+    "золот", "шоколад", "капучино", "мокко", "венге", "бордо", "шампань", "олив", "салат", "пудр",
+    "персик", "терра", "горчи", "мят", "ментол", "слив", "коф", "изумруд", "васильк", "лазур",
+    "индиго", "айвори", "тиффани", "фукси", "дымчат", "бруснич", "топлен", "антрацит",
+)
+
+class CortinAuthError(Exception):
+    """Сайт Cortin вернул страницу авторизации вместо остатков"""
+
+# Сколько раз вместо остатков получен признак истекшей сессии, по виду признака:
+# status - HTTP 401/403, redirect - переадресация на страницу входа,
+# login_page - форма входа на странице, few_rows - слишком мало материалов
+auth_failure_stats = {"status": 0, "redirect": 0, "login_page": 0, "few_rows": 0}
+
+def _auth_failure(reason: str, message: str) -> CortinAuthError:
+    """Учитывает признак истекшей сессии и возвращает ошибку для выбрасывания"""
+    auth_failure_stats[reason] += 1
+    return CortinAuthError(message)
+
+def get_auth_failure_stats() -> Dict[str, int]:
+    """Возвращает счетчики признаков истекшей сессии"""
+    return dict(auth_failure_stats)
+
+def normalize_stock_name(name: str) -> str:
+    """Приводит название материала к виду для сравнения: регистр, ё/е, пробелы и знаки препинания"""
+    return " ".join(NAME_TOKEN_PATTERN.findall(name.lower().replace("ё", "е")))
+
+def _name_key_tokens(name: str) -> tuple:
+    """Возвращает (артикулы, цвета) названия - слова, по которым различаются материалы одной ткани"""
+    codes, colors = set(), set()
+    for token in KEY_TOKEN_PATTERN.findall(name.lower().replace("ё", "е")):
+        if any(char.isdigit() for char in token):
+            # "V-04" и "V04" - один артикул
+            codes.add(re.sub(r"^([^\W\d_]+)-(?=\d)", r"\1", token))
+        elif any(part.startswith(COLOR_STEMS) for part in token.split("-")):
+            colors.add(token)
+    return codes, colors
+
+def _replaces_key_token(query_tokens: set, row_tokens: set) -> bool:
+    """Заменено ли в строке слово запроса другим (у каждого есть слово, которого нет у другого)"""
+    return bool(query_tokens - row_tokens) and bool(row_tokens - query_tokens)
+
+def _name_trigrams(normalized_name: str) -> set:
+    padded = f" {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def build_variant_search_index(variants_by_name: Dict[str, Dict], variants_by_fabric: Dict[str, List[Dict]]) -> tuple:
+    """Строит индексы поиска полотен каталога по запросу пользователя
+
+    Возвращает ({нормализованный тип ткани: тип ткани}, {слово: [названия полотен]}),
+    названия в списках - в порядке каталога.
+    """
+    fabrics_by_normalized = {}
+    for fabric in variants_by_fabric:
+        fabrics_by_normalized.setdefault(normalize_stock_name(fabric), fabric)
+    names_by_token: Dict[str, List[str]] = {}
+    for name in variants_by_name:
+        for token in dict.fromkeys(normalize_stock_name(name).split()):
+            names_by_token.setdefault(token, []).append(name)
+    return fabrics_by_normalized, names_by_token
+
+FABRICS_BY_NORMALIZED_NAME, VARIANT_NAMES_BY_TOKEN = build_variant_search_index(VARIANTS_BY_NAME, VARIANTS_BY_FABRIC)
+
+def find_variant_names(query: str) -> List[str]:
+    """Возвращает названия полотен каталога по запросу ("Лён", "лен бежевый")
+
+    Запрос, совпадающий с типом ткани, дает все полотна этого типа,
+    иначе - полотна, в названии которых есть все слова запроса.
+    """
+    normalized_query = normalize_stock_name(query)
+    if not normalized_query:
+        return []
+    fabric = FABRICS_BY_NORMALIZED_NAME.get(normalized_query)
+    if fabric is not None:
+        return [variant['name'] for variant in VARIANTS_BY_FABRIC[fabric] if variant.get('name')]
+    tokens = normalized_query.split()
+    # Начинаем с самого редкого слова, остальные проверяем по множествам
+    postings = sorted((VARIANT_NAMES_BY_TOKEN.get(token, []) for token in tokens), key=len)
+    rest = [set(names) for names in postings[1:]]
+    return [name for name in postings[0] if all(name in names for names in rest)]
+
+class StockMatch(NamedTuple):
+    """Найденная строка страницы остатков"""
+    material: str
+    stock_amount: Optional[str]
+    confidence: float  # 1.0 - точное совпадение названия
+
+class StockMatchIndex:
+    """Индекс поиска материалов снимка по похожему названию
+
+    Названия нормализуются один раз при построении. Кандидаты отбираются
+    по общим триграммам, уверенность - среднее коэффициента Дайса по
+    триграммам и доли общих слов. Кандидат, в котором артикул или цвет
+    запроса заменен другим ("V02" на "V01", "белая" на "серая"), не
+    принимается: это соседний материал, а не тот же самый.
+    """
+
+    def __init__(self, rows: List[tuple]):
+        self._entries: List[tuple] = []      # [(data-material, остаток)]
+        self._tokens: List[set] = []         # слова нормализованных названий
+        self._key_tokens: List[tuple] = []   # (артикулы, цвета) названий
+        self._trigram_counts: List[int] = []
+        self._exact: Dict[str, int] = {}     # {нормализованное название: позиция}
+        self._postings: Dict[str, List[int]] = {}  # {триграмма: [позиции]}
+
+        for material, stock_amount in rows:
+            # Строки без остатка не помогают ответить пользователю
+            if stock_amount is None:
+                continue
+            normalized_name = normalize_stock_name(material)
+            if not normalized_name:
+                continue
+            pos = len(self._entries)
+            self._entries.append((material, stock_amount))
+            tokens = set(normalized_name.split())
+            self._tokens.append(tokens)
+            self._key_tokens.append(_name_key_tokens(material))
+            self._exact.setdefault(normalized_name, pos)
+            trigrams = _name_trigrams(normalized_name)
+            self._trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, []).append(pos)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find_exact(self, material_name: str) -> Optional[StockMatch]:
+        """Возвращает строку с тем же названием после нормализации (регистр, ё/е, пробелы)"""
+        pos = self._exact.get(normalize_stock_name(material_name))
+        if pos is None:
+            return None
+        return StockMatch(*self._entries[pos], 1.0)
+
+    def find_best(self, material_name: str, min_confidence: float = CORTIN_MATCH_MIN_CONFIDENCE) -> Optional[StockMatch]:
+        """Возвращает самое похожее название с остатком (при равенстве - первое на странице)"""
+        normalized_name = normalize_stock_name(material_name)
+        if not normalized_name:
+            return None
+        exact = self.find_exact(material_name)
+        if exact is not None:
+            return exact
+
+        query_trigrams = _name_trigrams(normalized_name)
+        shared: Dict[int, int] = {}
+        for trigram in query_trigrams:
+            for pos in self._postings.get(trigram, ()):
+                shared[pos] = shared.get(pos, 0) + 1
+
+        query_tokens = set(normalized_name.split())
+        query_codes, query_colors = _name_key_tokens(material_name)
+        best_pos, best_confidence = None, 0.0
+        for pos, shared_count in shared.items():
+            row_codes, row_colors = self._key_tokens[pos]
+            if _replaces_key_token(query_codes, row_codes) or _replaces_key_token(query_colors, row_colors):
+                continue
+            trigram_score = 2 * shared_count / (len(query_trigrams) + self._trigram_counts[pos])
+            row_tokens = self._tokens[pos]
+            token_score = len(query_tokens & row_tokens) / len(query_tokens | row_tokens)
+            confidence = (trigram_score + token_score) / 2
+            if confidence > best_confidence or (confidence == best_confidence and best_pos is not None and pos < best_pos):
+                best_pos, best_confidence = pos, confidence
+
+        if best_pos is None or best_confidence < min_confidence:
+            return None
+        return StockMatch(*self._entries[best_pos], round(best_confidence, 2))
+
+class StockSnapshot:
+    """Остатки всех материалов со страницы Cortin на момент загрузки"""
+
+    def __init__(self, rows: List[tuple]):
+        # rows: [(data-material, остаток или None)] в порядке страницы
+        self.rows = rows
+        self.stock: Dict[str, Optional[str]] = {}
+        for material, stock_amount in rows:
+            self.stock.setdefault(material, stock_amount)
+        # Остатки в метрах, чтобы сравнивать с нужным количеством без разбора строк
+        self.meters: Dict[str, Optional[float]] = {
+            material: parse_stock_meters(stock_amount) for material, stock_amount in self.stock.items()
+        }
+        self.index = StockMatchIndex(rows)
+        # Время разбора этой страницы и ожидания потоков пула (заполняет _fetch_stock_snapshot)
+        self.parse_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def match(self, material_name: str) -> Optional[StockMatch]:
+        """Ищет материал: по точному названию, иначе по самому похожему названию"""
+        if material_name in self.stock:
+            return StockMatch(material_name, self.stock[material_name], 1.0)
+        return self.index.find_best(material_name)
+
+class StockPageParser(HTMLParser):
+    """Потоковый разбор страницы остатков Cortin
+
+    Страница подается частями через feed(), дерево документа не строится:
+    сохраняются только строки tr[data-material] с текстом последней ячейки
+    и признаки страницы авторизации.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[tuple] = []  # [(data-material, остаток или None)]
+        self.has_login_form = False
+        self.has_auth_action = False
+        self._title_parts: List[str] = []
+        self._in_title = False
+        self._row_material: Optional[str] = None  # data-material текущей строки
+        self._last_cell: Optional[str] = None     # текст последней закрытой ячейки строки
+        self._cell_parts: Optional[List[str]] = None
+
+    @property
+    def has_auth_title(self) -> bool:
+        title_text = "".join(self._title_parts).lower()
+        return "авторизация" in title_text and "остатки" not in title_text
+
+    @property
+    def auth_detected(self) -> bool:
+        """Есть ли на уже разобранной части страницы признаки формы авторизации"""
+        return self.has_login_form or self.has_auth_action or self.has_auth_title
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._finish_row()
+            attrs = dict(attrs)
+            if "data-material" in attrs:
+                self._row_material = attrs["data-material"] or ""
+        elif tag == "td":
+            if self._row_material is not None:
+                self._finish_cell()
+                self._cell_parts = []
+        elif tag == "input":
+            if dict(attrs).get("type") == "password":
+                self.has_login_form = True
+        elif tag == "form":
+            action = dict(attrs).get("action")
+            if action and "/site/login" in action:
+                self.has_auth_action = True
+        elif tag == "title":
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        if tag == "td":
+            self._finish_cell()
+        elif tag == "tr":
+            self._finish_row()
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._cell_parts is not None:
+            data_stripped = data.strip()
+            if data_stripped:
+                self._cell_parts.append(data_stripped)
+        if self._in_title:
+            self._title_parts.append(data)
+
+    def close(self):
+        super().close()
+        self._finish_row()
+
+    def _finish_cell(self) -> None:
+        if self._cell_parts is not None:
+            self._last_cell = "".join(self._cell_parts)
+            self._cell_parts = None
+
+    def _finish_row(self) -> None:
+        if self._row_material is None:
+            return
+        self._finish_cell()
+        stock_amount = None
+        if self._last_cell is not None:
+            # Остаток в последней ячейке, извлекаем число
+            match = STOCK_AMOUNT_PATTERN.search(self._last_cell)
+            if match:
+                stock_amount = match.group(1)
+        self.rows.append((self._row_material, stock_amount))
+        self._row_material = None
+        self._last_cell = None
+
+    def snapshot(self, min_rows: int = MIN_STOCK_ROWS) -> StockSnapshot:
+        """Возвращает снимок остатков, при странице авторизации выбрасывает CortinAuthError"""
+        # Если есть признаки неудачной авторизации
+        if self.auth_detected:
+            raise _auth_failure("login_page", "Обнаружена страница авторизации")
+        # Если материалов слишком мало, возможно авторизация не прошла
+        if len(self.rows) < min_rows:
+            raise _auth_failure("few_rows", f"На странице остатков только {len(self.rows)} материалов")
+        return StockSnapshot(self.rows)
+
+def parse_stock_page(text: str) -> StockSnapshot:
+    """Разбирает страницу остатков целиком в снимок"""
+    parser = StockPageParser()
+    parser.feed(text)
+    parser.close()
+    return parser.snapshot()
+
+def _timed_feed(parser: StockPageParser, text: str, final: bool = False) -> float:
+    """Передает часть страницы парсеру и возвращает время разбора; выполняется в потоке"""
+    started = time.perf_counter()
+    parser.feed(text)
+    if final:
+        parser.close()
+    return time.perf_counter() - started
+
+async def _run_timed(loop, func, *args) -> tuple:
+    """Выполняет func в пуле разбора; возвращает (результат, время работы, ожидание потока)"""
+    def timed():
+        started = time.perf_counter()
+        return func(*args), started, time.perf_counter() - started
+    
+    submitted = time.perf_counter()
+    result, started, seconds = await loop.run_in_executor(_parse_executor, timed)
+    return result, seconds, started - submitted
+
+def _record_parse_time(parse_seconds: float, wait_seconds: float) -> None:
+    parse_stats["count"] += 1
+    parse_stats["total_seconds"] += parse_seconds
+    parse_stats["max_seconds"] = max(parse_stats["max_seconds"], parse_seconds)
+    parse_stats["last_seconds"] = parse_seconds
+    parse_stats["total_wait_seconds"] += wait_seconds
+    parse_stats["max_wait_seconds"] = max(parse_stats["max_wait_seconds"], wait_seconds)
+    parse_stats["last_wait_seconds"] = wait_seconds
+
+def get_parse_stats() -> Dict[str, float]:
+    """Возвращает статистику разбора страниц остатков"""
+    stats = dict(parse_stats)
+    stats["avg_seconds"] = stats["total_seconds"] / stats["count"] if stats["count"] else 0.0
+    stats["avg_wait_seconds"] = stats["total_wait_seconds"] / stats["count"] if stats["count"] else 0.0
+    return stats
+
+def shutdown_parse_executor() -> None:
+    """Останавливает пул потоков разбора (при остановке бота)"""
+    _parse_executor.shutdown(wait=False, cancel_futures=True)
+
+def _check_auth_response(resp: aiohttp.ClientResponse) -> None:
+    """Проверяет по статусу и переадресациям, не истекла ли сессия (до чтения тела)"""
+    if resp.status in (401, 403):
+        raise _auth_failure("status", f"Cortin вернул HTTP {resp.status}")
+    for response in (*resp.history, resp):
+        location = response.headers.get("Location", "")
+        if LOGIN_PATH in response.url.path or LOGIN_PATH in location:
+            raise _auth_failure("redirect", "Переадресация на страницу входа")
+
+async def _fetch_stock_snapshot(params: Dict[str, str], cookies: Dict[str, str],
+                                min_rows: int = MIN_STOCK_ROWS) -> StockSnapshot:
+    """Загружает страницу остатков Cortin, разбирая ее по мере получения частей
+
+    Истекшая сессия определяется до загрузки всей страницы: по статусу,
+    переадресации на страницу входа или форме входа в первых частях ответа.
+    Загрузка при этом прерывается.
+    """
+    loop = asyncio.get_running_loop()
+    session = get_session()
+    async with session.get(CORTIN_STOCKS_URL, headers=CORTIN_HEADERS, cookies=cookies, params=params, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+        _check_auth_response(resp)
+        if resp.status != 200:
+            raise aiohttp.ClientResponseError(
+                resp.request_info, resp.history,
+                status=resp.status, message=f"Cortin вернул HTTP {resp.status}"
+            )
+        
+        decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+        parser = StockPageParser()
+        parse_seconds = 0.0
+        wait_seconds = 0.0
+        # Части разбираются в пуле потоков по очереди, event loop не блокируется
+        async for chunk in resp.content.iter_chunked(READ_CHUNK_SIZE):
+            _, seconds, wait = await _run_timed(loop, _timed_feed, parser, decoder.decode(chunk))
+            parse_seconds += seconds
+            wait_seconds += wait
+            # Заголовок и форма входа идут в начале страницы: остаток не загружаем
+            if parser.auth_detected:
+                raise _auth_failure("login_page", "Обнаружена страница авторизации")
+        _, seconds, wait = await _run_timed(loop, _timed_feed, parser, decoder.decode(b"", final=True), True)
+        parse_seconds += seconds
+        wait_seconds += wait
+    
+    # Снимок вместе с индексом поиска тоже строится вне event loop
+    snapshot, seconds, wait = await _run_timed(loop, parser.snapshot, min_rows)
+    snapshot.parse_seconds = parse_seconds + seconds
+    snapshot.wait_seconds = wait_seconds + wait
+    _record_parse_time(snapshot.parse_seconds, snapshot.wait_seconds)
+    return snapshot
+
+async def load_stock_snapshot(key: tuple) -> StockSnapshot:
+    """Загружает и разбирает страницу остатков для (category, product_type)
+    
+    Сессия берется из пула cortin_sessions. Если сайт вернул страницу
+    авторизации, запрос повторяется с другой исправной сессией, а для
+    сессии в фоне выполняется вход (cortin_auth). Если страницу авторизации
+    получили все сессии, загрузка ждет входа и повторяется один раз.
+    """
+    category, product_type = key
+    params = {
+        'category': category,
+        'type': product_type
+    }
+    min_rows = get_min_stock_rows(product_type)
+    tried = []
+    last_error = None
+    relogin_attempted = False
+    cookies_version = cortin_sessions.store.version
+    while True:
+        session = cortin_sessions.acquire(exclude=tried, healthy_only=bool(tried))
+        if session is None:
+            if isinstance(last_error, CortinAuthError) and not relogin_attempted:
+                relogin_attempted = True
+                await asyncio.gather(*(refresh_session(name) for name in tried))
+                # Повторяем, если cookies обновились за время этой загрузки (в том числе фоновым входом)
+                if cortin_sessions.store.version != cookies_version:
+                    tried = []
+                    continue
+            raise last_error or CortinAuthError("Нет сессий Cortin (cortin_cookies.json пуст)")
+        tried.append(session.name)
+        
+        started = time.monotonic()
+        latency = None
+        auth_failed = False
+        try:
+            snapshot = await call_upstream("cortin", lambda: _fetch_stock_snapshot(params, session.cookies, min_rows))
+            latency = time.monotonic() - started
+        except CortinAuthError as e:
+            auth_failed = True
+            last_error = e
+            print(f"Cortin: сессия {session.name} не авторизована ({e})")
+            schedule_refresh(session.name)
+            continue
+        finally:
+            cortin_sessions.release(session, latency=latency, auth_failed=auth_failed)
+        
+        print(
+            f"Снимок остатков Cortin ({category} / {product_type}, сессия {session.name}): {len(snapshot)} материалов, "
+            f"разбор {snapshot.parse_seconds * 1000:.0f} мс, ожидание потока {snapshot.wait_seconds * 1000:.0f} мс"
+        )
+        return snapshot
+
+# Снимки страницы остатков по (category, product_type): одна загрузка на всех пользователей
+stock_snapshot_cache = AsyncTTLCache("cortin_stocks", load_stock_snapshot, ttl=CORTIN_SNAPSHOT_TTL)
+
+async def fetch_snapshot_with_cookies(cookies: Dict[str, str], category: str = CORTIN_STOCK_CATEGORY,
+                                      product_type: str = DEFAULT_PRODUCT_TYPE) -> StockSnapshot:
+    """Загружает страницу остатков с указанными cookies (CortinAuthError - cookies не действуют)"""
+    params = {
+        'category': category,
+        'type': product_type
+    }
+    return await call_upstream("cortin", lambda: _fetch_stock_snapshot(params, cookies, get_min_stock_rows(product_type)))
+
+async def check_session(session_name: str) -> Optional[bool]:
+    """Проверяет сессию пула загрузкой страницы остатков по умолчанию
+
+    Загруженный снимок сохраняется в stock_snapshot_cache, поэтому проверка
+    не создает лишних загрузок. Возвращает True/False - cookies действуют
+    или нет, None - сессии нет в пуле.
+    """
+    session = cortin_sessions.acquire_session(session_name)
+    if session is None:
+        return None
+    
+    started = time.monotonic()
+    latency = None
+    auth_failed = False
+    try:
+        snapshot = await fetch_snapshot_with_cookies(session.cookies)
+        latency = time.monotonic() - started
+    except CortinAuthError as e:
+        auth_failed = True
+        print(f"Cortin: проверка сессии {session_name}: {e}")
+        schedule_refresh(session_name)
+        return False
+    finally:
+        cortin_sessions.release(session, latency=latency, auth_failed=auth_failed)
+    
+    stock_snapshot_cache.put((CORTIN_STOCK_CATEGORY, DEFAULT_PRODUCT_TYPE), snapshot)
+    return True
+
+def get_snapshot_stale_age(key: tuple) -> Optional[float]:
+    """Возвращает возраст снимка, если ответ нужно пометить как устаревший
+
+    Устаревшим считается снимок старше TTL при недоступном сайте
+    или старше двух TTL (фоновые обновления не удаются).
+    """
+    age = stock_snapshot_cache.age(key)
+    if age is None or age < CORTIN_SNAPSHOT_TTL:
+        return None
+    if not get_breaker("cortin").is_closed or age >= 2 * CORTIN_SNAPSHOT_TTL:
+        return age
+    return None
+
 # Функция для получения актуального остатка ткани по имени с сайта
 async def get_fabric_stock_online(material_name: str, category: str = "Римские шторы", product_type: str = "День-Ночь") -> Dict[str, str]:
     """Получает актуальный остаток ткани с сайта Cortin
     
+    Остаток берется из снимка страницы остатков, который загружается
+    не чаще раза в CORTIN_SNAPSHOT_TTL. Если сайт недоступен, снимок
+    отдается с ключом stale_age (возраст данных в секундах). Если материал
+    найден по похожему названию, в ответе есть matched_material и
+    match_confidence (0..1).
+    
     Args:
         material_name: Название материала
         category: Категория изделия (по умолчанию "Римские шторы")
         product_type: Тип изделия (по умолчанию "День-Ночь")
     """
+    # Материал, которого недавно не было на странице остатков, не ищем повторно
+    not_found_key = (category, product_type, material_name)
+    if not_found_cache.contains("cortin", not_found_key):
+        return {"availability": get_availability_status(None)}
+    
+    snapshot_key = (category, product_type)
+    try:
+        snapshot = await stock_snapshot_cache.get(snapshot_key)
+    except CortinAuthError as e:
+        print(f"Cortin: {e}")
+        return {"availability": "❓ Нет данных (требуется авторизация)"}
+    except Exception as e:
+        print(f"Ошибка получения остатка для {material_name}: {e}")
+        return {"availability": get_availability_status(None)}
+    
+    match = snapshot.match(material_name)
+    if match is None:
+        not_found_cache.add("cortin", not_found_key)
+    
+    answer = {"availability": get_availability_status(match.stock_amount if match else None)}
+    if match is not None and match.material != material_name:
+        # Найдено по похожему названию: показываем, что именно нашли и насколько уверены
+        answer["matched_material"] = match.material
+        answer["match_confidence"] = match.confidence
+    stale_age = get_snapshot_stale_age(snapshot_key)
+    if stale_age is not None:
+        answer["stale_age"] = stale_age
+    return answer
 
-    # Формируем URL с параметрами
-    base_url = "https://sale.cortin.ru/mfg/stocks/materials"
-    params = {
-        'category': category,
-        'type': product_type,
-        'material': material_name
-    }
+def get_stock_product_types() -> List[str]:
+    """Возвращает типы изделий, для которых запрашиваются остатки (из shutters.json)
+
+    Это изделия группы CORTIN_SHUTTER_GROUP: День-Ночь и типы из
+    CORTIN_DAY_NIGHT_CATEGORY_IDS (для проёма, створки, кассетные, на петлях).
+    """
+    product_types = [
+        item['shortName'] for item in get_shutters_by_category(CORTIN_SHUTTER_GROUP)
+        if item.get('shortName')
+    ]
+    return product_types or [DEFAULT_PRODUCT_TYPE]
+
+class MergedStockView:
+    """Остатки материалов по всем типам изделий одной категории
+
+    by_material: {data-material: {тип изделия: остаток или None}}.
+    """
+
+    def __init__(self, snapshots: Dict[str, StockSnapshot], errors: Dict[str, Exception]):
+        self.snapshots = snapshots  # {тип изделия: снимок} в порядке типов
+        self.errors = errors        # {тип изделия: ошибка загрузки}
+        self.by_material: Dict[str, Dict[str, Optional[str]]] = {}
+        for product_type, snapshot in snapshots.items():
+            for material, stock_amount in snapshot.stock.items():
+                self.by_material.setdefault(material, {})[product_type] = stock_amount
+        self._meters: Dict[str, Optional[float]] = {}
+
+    def match(self, material_name: str) -> Dict[str, StockMatch]:
+        """Ищет материал в каждом типе изделия: {тип изделия: найденная строка}"""
+        exact = self.by_material.get(material_name, {})
+        matches = {}
+        for product_type, snapshot in self.snapshots.items():
+            if product_type in exact:
+                matches[product_type] = StockMatch(material_name, exact[product_type], 1.0)
+            else:
+                match = snapshot.index.find_best(material_name)
+                if match is not None:
+                    matches[product_type] = match
+        return matches
+
+    def exact_matches(self, material_name: str) -> Dict[str, StockMatch]:
+        """Ищет материал в каждом типе изделия только по точному названию (без похожих)"""
+        exact = self.by_material.get(material_name, {})
+        matches = {}
+        for product_type, snapshot in self.snapshots.items():
+            if product_type in exact:
+                matches[product_type] = StockMatch(material_name, exact[product_type], 1.0)
+            else:
+                match = snapshot.index.find_exact(material_name)
+                if match is not None:
+                    matches[product_type] = match
+        return matches
+
+    def stock_meters(self, material_name: str) -> Optional[float]:
+        """Наибольший остаток материала среди типов изделий в метрах (None - нет данных)
+
+        Учитываются только строки с точным названием: остаток похожего
+        материала (другого цвета или артикула) не должен попасть в значок.
+        """
+        if material_name not in self._meters:
+            amounts = [
+                self.snapshots[product_type].meters.get(match.material)
+                for product_type, match in self.exact_matches(material_name).items()
+            ]
+            known = [amount for amount in amounts if amount is not None]
+            self._meters[material_name] = max(known) if known else None
+        return self._meters[material_name]
+
+# Объединенный вид хранится, пока не сменится ни один из снимков
+_merged_views: Dict[str, tuple] = {}  # {category: (снимки, MergedStockView)}
+
+async def get_merged_stock_view(category: str = CORTIN_STOCK_CATEGORY) -> MergedStockView:
+    """Загружает снимки всех типов изделий одновременно и объединяет их
+
+    Снимки берутся из stock_snapshot_cache, поэтому общие с одиночными
+    запросами. Загрузки типов - одна операция для выключателя Cortin:
+    их одновременные таймауты считаются одной неудачей. Если не загрузился
+    ни один тип, выбрасывается ошибка (CortinAuthError, если сайт вернул
+    страницу авторизации).
+    """
+    product_types = get_stock_product_types()
+    with upstream_failure_group():
+        results = await asyncio.gather(
+            *(stock_snapshot_cache.get((category, product_type)) for product_type in product_types),
+            return_exceptions=True
+        )
+    snapshots = {}
+    errors = {}
+    for product_type, result in zip(product_types, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            errors[product_type] = result
+        else:
+            snapshots[product_type] = result
+    if not snapshots:
+        auth_error = next((e for e in errors.values() if isinstance(e, CortinAuthError)), None)
+        raise auth_error or next(iter(errors.values()))
     
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Referer": "https://sale.cortin.ru/"
-    }
-    cookies = {
-        "PHPSESSID": "00b6aa6c21e23940417baef694331a97",
-        "_identity": "c76ce45b37b4ba9599e270e8b63a19af76abd5a5f7e3cf6eb960622d247712fba%3A2%3A%7Bi%3A0%3Bs%3A9%3A%22_identity%22%3Bi%3A1%3Bs%3A18%3A%22%5B495%2Cnull%2C2592000%5D%22%3B%7D",
-        "_csrf": "bff7bcc2624607ab4fa752a55325441d95928650d8be8a7b47ce73d314515c5aa%3A2%3A%7Bi%3A0%3Bs%3A5%3A%22_csrf%22%3Bi%3A1%3Bs%3A32%3A%22oP7u8WuVy686bIW9vgcReRPXuASSzgfT%22%3B%7D"
-    }
+    cached = _merged_views.get(category)
+    snapshot_ids = tuple((product_type, id(snapshot)) for product_type, snapshot in snapshots.items())
+    if cached is not None and cached[0] == snapshot_ids:
+        return cached[1]
+    view = MergedStockView(snapshots, errors)
+    _merged_views[category] = (snapshot_ids, view)
+    return view
+
+async def get_fabric_stock_all_types(material_name: str, category: str = CORTIN_STOCK_CATEGORY) -> Dict:
+    """Получает остаток ткани сразу для всех типов изделий категории
+    
+    Возвращает {"by_type": {тип изделия: ответ как в get_fabric_stock_online}}
+    и stale_age (возраст самых старых данных), если сайт недоступен.
+    Если остатки не загрузились ни для одного типа, возвращает {"availability": ...}.
+    """
+    not_found_key = (category, "*", material_name)
+    if not_found_cache.contains("cortin", not_found_key):
+        return {"availability": get_availability_status(None)}
     
     try:
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        
-        async with aiohttp.ClientSession(connector=connector) as session:
-            # Делаем запрос с параметрами
-            async with session.get(base_url, headers=headers, cookies=cookies, params=params, timeout=15) as resp:
-
-                if resp.status == 200:
-                    text = await resp.text()
-                    soup = BeautifulSoup(text, "html.parser")
-                    
-                    # Улучшенная проверка авторизации
-                    # Проверяем наличие формы авторизации
-                    has_login_form = soup.find("input", {"type": "password"}) is not None
-                    has_auth_action = soup.find("form", {"action": lambda x: x and "/site/login" in x if x else False}) is not None
-                    
-                    # Проверяем заголовок страницы
-                    title = soup.find("title")
-                    title_text = title.get_text().lower() if title else ""
-                    has_auth_title = "авторизация" in title_text and "остатки" not in title_text
-                    
-                    # Если есть признаки неудачной авторизации
-                    if has_login_form or has_auth_action or has_auth_title:
-                        return {"availability": "❓ Нет данных (требуется авторизация)"}
-                    
-                    # Проверяем наличие данных о материалах
-                    material_count = len(soup.find_all("tr", {"data-material": True}))
-                    if material_count < 100:  # Если материалов слишком мало, возможно авторизация не прошла
-                        return {"availability": "❓ Нет данных (требуется авторизация)"}
-                    tr = soup.find("tr", {"data-material": material_name})
-                    if tr:
-                        tds = tr.find_all("td")
-                        if tds:
-                            # Остаток в последней ячейке
-                            stock_text = tds[-1].get_text(strip=True)
-                            # Извлекаем число
-                            match = re.search(r"([\d\.,]+)", stock_text)
-                            if match:
-                                stock_amount = match.group(1)
-                                return {"availability": get_availability_status(stock_amount)}
-                    else:
-                        # Если ткань не найдена, попробуем найти по частичному совпадению
-                        all_rows = soup.find_all("tr", {"data-material": True})
-                        for row in all_rows:
-                            row_material = row.get("data-material", "")
-                            if material_name.lower() in row_material.lower() or row_material.lower() in material_name.lower():
-                                tds = row.find_all("td")
-                                if tds:
-                                    stock_text = tds[-1].get_text(strip=True)
-                                    match = re.search(r"([\d\.,]+)", stock_text)
-                                    if match:
-                                        stock_amount = match.group(1)
-                                        return {"availability": get_availability_status(stock_amount)}
-                    
-                    return {"availability": get_availability_status(None)}
+        view = await get_merged_stock_view(category)
+    except CortinAuthError as e:
+        print(f"Cortin: {e}")
+        return {"availability": "❓ Нет данных (требуется авторизация)"}
     except Exception as e:
-        print(f"Ошибка получения остатка для {material_name}: {e}")
+        print(f"Ошибка получения остатков для {material_name}: {e}")
+        return {"availability": get_availability_status(None)}
+    
+    matches = view.match(material_name)
+    if not matches and not view.errors:
+        not_found_cache.add("cortin", not_found_key)
+    
+    by_type = {}
+    for product_type in get_stock_product_types():
+        match = matches.get(product_type)
+        if match is None:
+            by_type[product_type] = {"availability": get_availability_status(None)}
+        else:
+            by_type[product_type] = {"availability": get_availability_status(match.stock_amount)}
+            if match.material != material_name:
+                by_type[product_type]["matched_material"] = match.material
+                by_type[product_type]["match_confidence"] = match.confidence
+    
+    answer = {"by_type": by_type}
+    stale_ages = [
+        age for age in (get_snapshot_stale_age((category, product_type)) for product_type in view.snapshots)
+        if age is not None
+    ]
+    if stale_ages:
+        answer["stale_age"] = max(stale_ages)
+    return answer
+
+async def find_fabrics_with_stock(query: str, meters_needed: float, category: str = CORTIN_STOCK_CATEGORY) -> Dict:
+    """Находит полотна по запросу, остатка которых хватает на meters_needed метров
+
+    Остатки берутся из объединенного вида снимков (get_merged_stock_view),
+    поэтому проверка целого типа ткани не требует дополнительных запросов
+    к сайту. Учитываются только строки с точным названием полотна: остаток
+    похожего материала не засчитывается. Возвращает
+    {"variants": [(название, метры)] по убыванию остатка,
+    "checked": число найденных по запросу полотен} и stale_age, если сайт
+    недоступен. При ошибке загрузки возвращает {"availability": ...}.
+    """
+    names = find_variant_names(query)
+    if not names:
+        return {"variants": [], "checked": 0}
+    
+    try:
+        view = await get_merged_stock_view(category)
+    except CortinAuthError as e:
+        print(f"Cortin: {e}")
+        return {"availability": "❓ Нет данных (требуется авторизация)"}
+    except Exception as e:
+        print(f"Ошибка получения остатков для запроса {query}: {e}")
         return {"availability": get_availability_status(None)}
+    
+    variants = []
+    for name in names:
+        meters = view.stock_meters(name)
+        if meters is not None and meters > 0 and meters >= meters_needed:
+            variants.append((name, meters))
+    variants.sort(key=lambda item: item[1], reverse=True)
+    
+    answer = {"variants": variants, "checked": len(names)}
+    stale_ages = [
+        age for age in (get_snapshot_stale_age((category, product_type)) for product_type in view.snapshots)
+        if age is not None
+    ]
+    if stale_ages:
+        answer["stale_age"] = max(stale_ages)
+    return answer
+
+async def get_fabrics_stock_meters(material_names: List[str], category: str = CORTIN_STOCK_CATEGORY,
+                                   timeout: float = CORTIN_BADGES_TIMEOUT) -> List[Optional[float]]:
+    """Возвращает остатки полотен в метрах для значков на кнопках
+
+    Остатки берутся из тех же снимков, что и карточка полотна. Если снимки
+    не получены за timeout, возвращаются пустые значения, а загрузка
+    продолжается в фоне и попадет в кэш.
+    """
+    try:
+        view = await asyncio.wait_for(get_merged_stock_view(category), timeout)
+    except asyncio.TimeoutError:
+        print(f"Значки наличия Cortin: остатки не получены за {timeout} с")
+        return [None] * len(material_names)
+    except Exception as e:
+        print(f"Значки наличия Cortin: ошибка получения остатков: {e}")
+        return [None] * len(material_names)
+    return [view.stock_meters(name) for name in material_names]
+
+def parse_stock_meters(stock_amount: Optional[str]) -> Optional[float]:
+    """Преобразует остаток со страницы ("12,5") в число метров (None - нет данных)"""
+    if stock_amount is None:
+        return None
+    try:
+        return float(stock_amount.replace(',', '.'))
+    except ValueError:
+        return None
 
 def get_availability_status(stock_amount: Optional[str]) -> str:
     """Возвращает статус наличия товара"""
@@ -175,31 +922,16 @@ def get_fabric_categories() -> List[str]:
 
 def get_fabric_variants(fabric_category: str) -> List[Dict]:
     """Возвращает варианты ткани по категории"""
-    for material in MATERIALS:
-        if material['fabric'] == fabric_category:
-            return material.get('variants', [])
-    return []
+    return VARIANTS_BY_FABRIC.get(fabric_category, [])
 
 def find_variant_by_id(variant_id):
-    """Находит вариант полотна по ID в grouped_materials.json"""
+    """Находит вариант полотна по ID (из загруженного grouped_materials.json)"""
     try:
         variant_id = int(variant_id)
-        # Получаем абсолютный путь к директории скрипта
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        with open(os.path.join(script_dir, 'cortin_data', 'grouped_materials.json'), 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # data это массив объектов, каждый с полями fabric и variants
-        for fabric_group in data:
-            variants = fabric_group.get('variants', [])
-            for variant in variants:
-                if variant.get('id') == variant_id:
-                    return variant
-        
-        return None
-    except Exception as e:
+    except (ValueError, TypeError) as e:
         print(f"Ошибка при поиске варианта по ID {variant_id}: {e}")
         return None
+    return VARIANTS_BY_ID.get(variant_id)
 
 def find_shutter_by_id(shutter_id) -> Optional[Dict]:
     """Находит штору по ID"""
@@ -246,11 +978,7 @@ def filter_fabrics_by_letter(letter: str) -> List[str]:
 
 def find_fabric_by_name(fabric_name: str) -> Optional[Dict]:
     """Находит полотно по названию"""
-    for material in MATERIALS:
-        for variant in material.get('variants', []):
-            if variant.get('name') == fabric_name:
-                return variant
-    return None
+    return VARIANTS_BY_NAME.get(fabric_name)
 
 def get_fabric_types_by_letter(letter: str) -> List[str]:
     """Получает типы тканей, начинающиеся с указанной буквы"""
@@ -263,7 +991,4 @@ def get_fabric_types_by_letter(letter: str) -> List[str]:
 
 def get_fabrics_by_type(fabric_type: str) -> List[Dict]:
     """Получает все полотна определенного типа"""
-    for material in MATERIALS:
-        if material.get('fabric') == fabric_type:
-            return material.get('variants', [])
-    return []
+    return VARIANTS_BY_FABRIC.get(fabric_type, [])
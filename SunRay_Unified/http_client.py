@@ -0,0 +1,257 @@
+"""
+Общий HTTP-клиент для запросов к сайтам и API заводов
+"""
+
+import asyncio
+import logging
+import os
+import random
+import ssl
+import time
+import aiohttp
+import certifi
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Настройки пула соединений
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "75"))
+
+# Повторы временных ошибок и автоматический выключатель для каждого поставщика
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_RETRY_BASE_DELAY = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.3"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Адреса, к которым заранее открываем соединения при запуске бота
+WARMUP_URLS = [
+    "https://customizer.amigo.ru/",
+    "https://sale.cortin.ru/",
+]
+
+_ssl_context: Optional[ssl.SSLContext] = None
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_ssl_context() -> ssl.SSLContext:
+    """Возвращает SSL контекст (CA-сертификаты загружаются один раз)"""
+    global _ssl_context
+
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+def _create_session() -> aiohttp.ClientSession:
+    """Создает сессию с пулом keep-alive соединений и кэшем DNS"""
+    connector = aiohttp.TCPConnector(
+        ssl=get_ssl_context(),
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    )
+    # Cookies передаются явно в каждом запросе, ответные cookies не сохраняем,
+    # чтобы сессии разных учетных записей не смешивались в общем пуле
+    return aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+
+async def init_http_client() -> aiohttp.ClientSession:
+    """Создает общую сессию (вызывается при старте диспетчера)"""
+    global _session
+
+    if _session is None or _session.closed:
+        _session = _create_session()
+        logger.info(
+            f"HTTP клиент создан: limit={HTTP_POOL_LIMIT}, limit_per_host={HTTP_POOL_LIMIT_PER_HOST}, "
+            f"dns_ttl={HTTP_DNS_CACHE_TTL}s"
+        )
+    return _session
+
+def get_session() -> aiohttp.ClientSession:
+    """Возвращает общую сессию, создавая ее при первом обращении
+
+    Должна вызываться из работающего event loop.
+    """
+    global _session
+
+    if _session is None or _session.closed:
+        _session = _create_session()
+        logger.info("HTTP клиент создан по первому запросу")
+    return _session
+
+async def _warm_up_url(session: aiohttp.ClientSession, url: str, timeout: float) -> None:
+    """Открывает соединение с хостом (DNS, TCP, TLS) и возвращает его в пул"""
+    try:
+        async with session.head(url, allow_redirects=False, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            logger.info(f"Прогрев соединения {url}: HTTP {resp.status}")
+    except Exception as e:
+        logger.warning(f"Не удалось прогреть соединение {url}: {e}")
+
+async def warm_up_connections(urls: Optional[List[str]] = None, timeout: float = 5) -> None:
+    """Заранее устанавливает соединения с хостами заводов"""
+    session = get_session()
+    await asyncio.gather(*(_warm_up_url(session, url, timeout) for url in (urls or WARMUP_URLS)))
+
+async def close_http_client() -> None:
+    """Закрывает общую сессию (вызывается при остановке диспетчера)"""
+    global _session
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("HTTP клиент закрыт")
+    _session = None
+
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    """Поставщик недоступен: запрос не выполнялся, так как выключатель разомкнут"""
+
+class CircuitBreaker:
+    """Автоматический выключатель запросов к одному поставщику
+
+    После failure_threshold подряд неудачных запросов размыкается и сразу
+    отклоняет запросы. Через reset_timeout пропускает один пробный запрос:
+    при успехе замыкается, при ошибке снова размыкается.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def allow_request(self) -> bool:
+        """Проверяет, можно ли сейчас выполнить запрос к поставщику"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Пропускаем один пробный запрос, остальные отклоняем до его результата
+            self.state = self.HALF_OPEN
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def release_probe(self) -> None:
+        """Возвращает выключатель в разомкнутое состояние, если пробный запрос отменен"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Поставщик {self.name} снова доступен")
+        self.state = self.CLOSED
+        self.failures = 0
+        self.stats["successes"] += 1
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.stats["failures"] += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.stats["opened"] += 1
+                logger.warning(f"Поставщик {self.name} недоступен, запросы приостановлены на {self.reset_timeout} с")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Возвращает выключатель поставщика (создается при первом обращении)"""
+    if upstream not in _breakers:
+        _breakers[upstream] = CircuitBreaker(upstream)
+    return _breakers[upstream]
+
+# Поставщики, неудача которых уже учтена в текущей группе параллельных запросов
+_failure_group: ContextVar[Optional[set]] = ContextVar("upstream_failure_group", default=None)
+
+@contextmanager
+def upstream_failure_group():
+    """Объединяет параллельные запросы одной операции для выключателя
+
+    Внутри группы неудачные запросы к одному поставщику считаются одной
+    неудачей: несколько одновременных таймаутов одного действия пользователя
+    не размыкают выключатель сами по себе. Группа передается задачам,
+    созданным внутри блока with.
+    """
+    token = _failure_group.set(set())
+    try:
+        yield
+    finally:
+        _failure_group.reset(token)
+
+def _record_failure(upstream: str, breaker: CircuitBreaker) -> None:
+    """Учитывает неудачу в выключателе (в группе - не больше одной на поставщика)"""
+    group = _failure_group.get()
+    if group is not None:
+        if upstream in group:
+            return
+        group.add(upstream)
+    breaker.record_failure()
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Определяет, говорит ли ошибка о недоступности поставщика"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Определяет, имеет ли смысл сразу повторить запрос
+
+    Таймауты не повторяются: пользователь и так уже ждал полный таймаут.
+    """
+    return is_upstream_failure(error) and not isinstance(error, asyncio.TimeoutError)
+
+async def call_upstream(
+    upstream: str,
+    request: Callable[[], Awaitable[T]],
+    retries: int = UPSTREAM_RETRIES,
+    base_delay: float = UPSTREAM_RETRY_BASE_DELAY
+) -> T:
+    """Выполняет запрос к поставщику через выключатель с повторами временных ошибок
+
+    Между повторами выдерживается случайная пауза от 0 до base_delay * 2^попытка.
+    Если выключатель разомкнут, сразу выбрасывает CircuitOpenError.
+    Ошибки, не связанные с доступностью поставщика, пробрасываются без повторов.
+    """
+    breaker = get_breaker(upstream)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Поставщик {upstream} временно недоступен")
+
+    attempt = 0
+    while True:
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            if not is_upstream_failure(e):
+                # Поставщик ответил, ошибка в самом ответе
+                breaker.record_success()
+                raise
+            if attempt >= retries or not is_retryable_error(e) or breaker.state == breaker.HALF_OPEN:
+                _record_failure(upstream, breaker)
+                raise
+            delay = random.uniform(0, base_delay * 2 ** attempt)
+            attempt += 1
+            logger.warning(f"{upstream}: временная ошибка ({e!r}), повтор {attempt}/{retries} через {delay:.2f} с")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -66,6 +66,10 @@ _catalog_data = None
 _category_map = {}  # {short_id: category_name}
 _fabric_map = {}    # {short_id: (category_name, fabric_name)}
 _item_map = {}      # {short_id: (category_name, fabric_name, item_index, item)}
+_fabric_groups = {}  # {category_name: {fabric_name: [items]}} - по первой категории с таким названием
+_fabric_colors = {}  # {category_name: {fabric_name: [color]}} - цвета товаров в порядке _fabric_groups
+_item_index = {}     # {(category_name, fabric_name, color.lower()): item} - первый товар с таким цветом
+_item_ids = {}       # {(category_name, fabric_name): [short_id]} - ID товаров в порядке _fabric_colors
 
 def load_catalog() -> Dict[str, Any]:
     """Загружает каталог из JSON файла"""
@@ -121,13 +125,53 @@ def load_catalog() -> Dict[str, Any]:
         logger.error(f"Ошибка загрузки каталога: {e}")
         return {}
 
+def extract_fabric_name(item_name: str) -> str:
+    """Извлекает название полотна из названия товара (первое слово в обратных кавычках)"""
+    if '`' in item_name:
+        fabric_part = item_name.split('`')[1]
+        if fabric_part.endswith('`'):
+            fabric_part = fabric_part[:-1]
+        words = fabric_part.split()
+        if len(words) >= 2:
+            return words[0]
+        return fabric_part
+    return item_name
+
+def group_items_by_fabric(items: List[Dict]) -> Dict[str, List[Dict]]:
+    """Группирует товары по названию полотна (в порядке каталога)"""
+    fabric_groups = {}
+    for item in items:
+        fabric_name = extract_fabric_name(item.get('name', ''))
+        if fabric_name not in fabric_groups:
+            fabric_groups[fabric_name] = []
+        fabric_groups[fabric_name].append(item)
+    return fabric_groups
+
+def _index_fabric_colors(category_name: str, fabric_groups: Dict[str, List[Dict]]):
+    """Запоминает цвета товаров категории и индекс (категория, полотно, цвет) -> товар"""
+    colors_by_fabric = {}
+    for fabric_name, items in fabric_groups.items():
+        colors = [extract_color_from_name(item.get('name', '')) for item in items]
+        colors_by_fabric[fabric_name] = colors
+        for color, item in zip(colors, items):
+            _item_index.setdefault((category_name, fabric_name, color.lower()), item)
+    _fabric_colors[category_name] = colors_by_fabric
+
 def _create_mappings():
-    """Создает маппинг коротких ID для категорий, полотен и товаров"""
+    """Создает маппинг коротких ID для категорий, полотен и товаров
+    
+    Здесь же один раз группируются товары всех категорий по полотнам,
+    чтобы навигация по Inter не разбирала названия товаров заново.
+    """
     global _category_map, _fabric_map, _item_map
     
     _category_map.clear()
     _fabric_map.clear()
     _item_map.clear()
+    _fabric_groups.clear()
+    _fabric_colors.clear()
+    _item_index.clear()
+    _item_ids.clear()
     
     catalog = _catalog_data
     if isinstance(catalog, list):
@@ -138,41 +182,32 @@ def _create_mappings():
             section = category.get('section', 'Нет')
             items = category.get('items', [])
             
+            # Группируем товары по названию полотна
+            fabric_groups = group_items_by_fabric(items)
+            if category.get('name') is not None and category['name'] not in _fabric_groups:
+                _fabric_groups[category['name']] = fabric_groups
+                _index_fabric_colors(category['name'], fabric_groups)
+            
             # Создаем маппинг только для категорий с section='Да' и товарами
             # И только для разрешенных типов Inter
             if len(items) > 0 and section == 'Да' and category_name.strip() in ALLOWED_TYPES_INTER:
                 cat_id = f"c{visible_cat_idx}"
                 _category_map[cat_id] = category_name
                 
-                # Группируем товары по названию полотна
-                fabric_groups = {}
-                for item in items:
-                    item_name = item.get('name', '')
-                    if '`' in item_name:
-                        fabric_part = item_name.split('`')[1]
-                        if fabric_part.endswith('`'):
-                            fabric_part = fabric_part[:-1]
-                        words = fabric_part.split()
-                        if len(words) >= 2:
-                            fabric_name = words[0]
-                        else:
-                            fabric_name = fabric_part
-                    else:
-                        fabric_name = item_name
-                    
-                    if fabric_name not in fabric_groups:
-                        fabric_groups[fabric_name] = []
-                    fabric_groups[fabric_name].append(item)
-                
                 # Создаем ID для полотен
                 for fab_idx, (fabric_name, fabric_items) in enumerate(fabric_groups.items()):
                     fab_id = f"f{visible_cat_idx}_{fab_idx}"
                     _fabric_map[fab_id] = (category_name, fabric_name)
                     
                     # Создаем ID для товаров
+                    item_ids = []
                     for item_idx, item in enumerate(fabric_items):
                         item_id = f"i{visible_cat_idx}_{fab_idx}_{item_idx}"
                         _item_map[item_id] = (category_name, fabric_name, item_idx, item)
+                        item_ids.append(item_id)
+                    # Кнопки цветов строятся по первой категории с таким названием
+                    if _fabric_groups.get(category_name) is fabric_groups:
+                        _item_ids[(category_name, fabric_name)] = item_ids
                 
                 visible_cat_idx += 1  # Увеличиваем счетчик только для видимых категорий
 
@@ -181,20 +216,9 @@ def get_fabric_types() -> List[str]:
     catalog = load_catalog()
     
     if isinstance(catalog, list):
-        # Новая структура - список категорий
-        visible_categories = []
-        for category in catalog:
-            category_name = category.get('name', 'Без названия')
-            section = category.get('section', 'Нет')
-            items = category.get('items', [])
-            
-            # Показываем только категории с section='Да' и с товарами
-            if len(items) > 0 and section == 'Да':
-                # Фильтруем по разрешенным типам для Inter
-                if category_name.strip() in ALLOWED_TYPES_INTER:
-                    visible_categories.append(category_name)
-        
-        return visible_categories
+        # Новая структура - видимые категории уже отобраны в _create_mappings
+        # (section='Да', есть товары, разрешенный тип Inter)
+        return list(_category_map.values())
     else:
         # Старая структура - словарь
         all_categories = list(catalog.keys())
@@ -210,38 +234,13 @@ def get_fabric_categories(fabric_type: str) -> List[str]:
     return list(fabric_groups.keys())
 
 def get_fabric_groups(fabric_type: str) -> Dict[str, List[Dict]]:
-    """Группирует ткани по названиям полотен для указанного типа"""
-    catalog = load_catalog()
-    
-    if isinstance(catalog, list):
-        # Новая структура - список категорий
-        category = next((cat for cat in catalog if cat.get('name') == fabric_type), None)
-        if category:
-            items = category.get('items', [])
-            
-            # Группируем товары по названию полотна
-            fabric_groups = {}
-            for item in items:
-                item_name = item.get('name', '')
-                if '`' in item_name:
-                    fabric_part = item_name.split('`')[1]
-                    if fabric_part.endswith('`'):
-                        fabric_part = fabric_part[:-1]
-                    words = fabric_part.split()
-                    if len(words) >= 2:
-                        fabric_name = words[0]
-                    else:
-                        fabric_name = fabric_part
-                else:
-                    fabric_name = item_name
-                
-                if fabric_name not in fabric_groups:
-                    fabric_groups[fabric_name] = []
-                fabric_groups[fabric_name].append(item)
-            
-            return fabric_groups
+    """Группирует ткани по названиям полотен для указанного типа
     
-    return {}
+    Группировка строится при загрузке каталога (_create_mappings);
+    возвращается общий словарь, изменять его нельзя.
+    """
+    load_catalog()
+    return _fabric_groups.get(fabric_type, {})
 
 def get_fabric_colors(fabric_type: str, fabric_category: str, fabric_name: str) -> List[Dict]:
     """Возвращает список цветов для указанной ткани"""
@@ -249,6 +248,16 @@ def get_fabric_colors(fabric_type: str, fabric_category: str, fabric_name: str)
     fabric_groups = get_fabric_groups(fabric_type)
     return fabric_groups.get(fabric_name, [])
 
+def get_color_names(fabric_type: str, fabric_name: str) -> List[str]:
+    """Возвращает цвета товаров полотна в порядке get_fabric_colors"""
+    load_catalog()
+    return _fabric_colors.get(fabric_type, {}).get(fabric_name, [])
+
+def get_item_ids(fabric_type: str, fabric_name: str) -> List[str]:
+    """Возвращает короткие ID товаров полотна в порядке get_color_names"""
+    load_catalog()
+    return _item_ids.get((fabric_type, fabric_name), [])
+
 def extract_color_from_name(fabric_name: str) -> str:
     """Извлекает цвет из названия ткани"""
     if '`' in fabric_name:
@@ -276,30 +285,39 @@ def get_availability_status(item: Dict) -> str:
     else:
         return "❓ Статус неизвестен"
 
+def _make_fabric_info(item: Dict, fabric_type: str) -> Dict:
+    """Формирует карточку товара"""
+    return {
+        'name': item.get('name', ''),
+        'status': get_availability_status(item),
+        'availability_text': item.get('availability_text', 'Информация недоступна'),
+        'image_url': item.get('image', ''),
+        'fabric_type': fabric_type,
+        'id': item.get('id', '')
+    }
+
 async def get_fabric_info(fabric_type: str, fabric_category: str, fabric_name: str, color: str) -> Optional[Dict]:
-    """Получает информацию о конкретной ткани"""
+    """Получает информацию о конкретной ткани (поиск по индексу, построенному при загрузке каталога)"""
     try:
-        colors_data = get_fabric_colors(fabric_type, fabric_category, fabric_name)
-        
-        # Ищем ткань с указанным цветом
-        for item in colors_data:
-            item_color = extract_color_from_name(item.get('name', ''))
-            if item_color.lower() == color.lower():
-                return {
-                    'name': item.get('name', ''),
-                    'status': get_availability_status(item),
-                    'availability_text': item.get('availability_text', 'Информация недоступна'),
-                    'image_url': item.get('image', ''),
-                    'fabric_type': fabric_type,
-                    'id': item.get('id', '')
-                }
-        
-        return None
+        load_catalog()
+        item = _item_index.get((fabric_type, fabric_name, color.lower()))
+        if item is None:
+            return None
+        return _make_fabric_info(item, fabric_type)
         
     except Exception as e:
         logger.error(f"Ошибка при получении информации о ткани: {e}")
         return None
 
+def get_item_info(item_id: str) -> Optional[Dict]:
+    """Получает информацию о товаре по короткому ID (i<категория>_<полотно>_<товар>)"""
+    load_catalog()
+    entry = _item_map.get(item_id)
+    if entry is None:
+        return None
+    category_name, _, _, item = entry
+    return _make_fabric_info(item, category_name)
+
 def get_display_name(key: str, display_dict: Dict[str, str]) -> str:
     """Возвращает отображаемое название или исходное, если не найдено"""
     return display_dict.get(key.lower(), key)
@@ -5,36 +5,15 @@
 """
 
 import json
-import re
+
+from cookie_store import CORTIN_COOKIES_FILE, write_cookies_file
 
 def update_cookies_in_file(cookies_dict):
-    """Обновляет cookies в файле cortin_data.py"""
-    
-    file_path = "cortin_data.py"
+    """Обновляет cookies в файле cortin_cookies.json (бот перечитает его сам)"""
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Заменяем PHPSESSID
-        content = re.sub(
-            r'"PHPSESSID":\s*"[^"]*"',
-            f'"PHPSESSID": "{cookies_dict["PHPSESSID"]}"',
-            content
-        )
-        
-        # Заменяем _identity (экранируем специальные символы)
-        identity_escaped = cookies_dict["_identity"].replace("\\", "\\\\").replace('"', '\\"')
-        content = re.sub(
-            r'"_identity":\s*"[^"]*"',
-            f'"_identity": "{identity_escaped}"',
-            content
-        )
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        print(f"✅ Cookies обновлены в файле {file_path}")
+        write_cookies_file(cookies_dict)
+        print(f"✅ Cookies обновлены в файле {CORTIN_COOKIES_FILE}")
         return True
         
     except Exception as e:
@@ -81,7 +60,7 @@ def main():
             print(f"⚠️ Не удалось сохранить backup: {e}")
         
         print("\n🎉 Готово! Cookies обновлены.")
-        print("💡 Теперь перезапустите бота для применения изменений")
+        print("💡 Запущенный бот применит новые cookies при следующем запросе, перезапуск не нужен")
     else:
         print("\n❌ Не удалось обновить cookies")
 
@@ -0,0 +1,86 @@
+"""
+Общие настройки тестов: модули бота лежат в родительском каталоге
+
+Здесь же заглушки сообщений и нажатий кнопок Telegram для тестов обработчиков
+и хранилище cookies Cortin в памяти для пула сессий.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeMessage:
+    """Сообщение, запоминающее edit_text и answer"""
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.edits = []    # [(текст, клавиатура)]
+        self.answers = []  # [текст]
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        self.edits.append((text, reply_markup))
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+class FakeCallback:
+    """Нажатие кнопки: data, message и answer"""
+
+    def __init__(self, data: str):
+        self.data = data
+        self.message = FakeMessage()
+        self.answers = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+class FakeCookieStore:
+    """Хранилище cookies в памяти: set_sessions имитирует перечитанный файл"""
+
+    def __init__(self, sessions):
+        self.version = 0
+        self.set_sessions(sessions)
+
+    def set_sessions(self, sessions):
+        self._sessions = {name: dict(cookies) for name, cookies in sessions.items()}
+        self.version += 1
+
+    def get_sessions(self):
+        return self._sessions
+
+@pytest.fixture
+def make_session_pool():
+    """Создает пул сессий Cortin: make_session_pool("a", "b") (хранилище - pool.store)"""
+    from cookie_store import SessionPool
+
+    def create(*names, **sessions) -> SessionPool:
+        sessions = {**{name: {"PHPSESSID": name} for name in names}, **sessions}
+        return SessionPool(FakeCookieStore(sessions))
+    return create
+
+@pytest.fixture
+def make_message():
+    """Создает сообщение пользователя: make_message("текст")"""
+    return FakeMessage
+
+@pytest.fixture
+def make_callback():
+    """Создает нажатие кнопки: make_callback("callback_data")"""
+    return FakeCallback
+
+@pytest.fixture
+def make_state():
+    """Создает FSMContext в памяти с данными: make_state(ключ=значение)"""
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    def create(**data) -> FSMContext:
+        state = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=1, user_id=1))
+        asyncio.run(state.set_data(data))
+        return state
+    return create
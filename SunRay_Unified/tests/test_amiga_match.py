@@ -0,0 +1,64 @@
+"""
+Поиск материала Amiga в индексе ответа API и значки наличия вариантов
+"""
+
+import asyncio
+
+import amiga_data
+from amiga_data import MaterialIndex, match_material
+
+def make_index(*materials) -> MaterialIndex:
+    return MaterialIndex([{"material": {"name": name, "availability": availability}}
+                          for name, availability in materials])
+
+INDEX_ITEMS = [
+    ("БЛЮЗ 0225 белый", 2),
+    ("ВИНТАЖ 0225 белый", 1),
+    ("ВИНТАЖ 4268 серый", 0),
+    ("Зебра АЛЬФА 0225 белый", 2),
+]
+
+class FakeMaterialsCache:
+    def __init__(self, index: MaterialIndex):
+        self.index = index
+
+    async def get(self, model_id):
+        return self.index
+
+def test_exact_match():
+    item, exact = match_material(make_index(*INDEX_ITEMS), "ВИНТАЖ", "0225 белый")
+    assert exact and item["material"]["name"] == "ВИНТАЖ 0225 белый"
+
+def test_variant_and_fabric_fallbacks_for_card():
+    index = make_index(("БЛЮЗ 0225 белый", 2), ("ВИНТАЖ 4268 серый", 0))
+    item, exact = match_material(index, "ВИНТАЖ", "0225 белый")
+    assert not exact and item["material"]["name"] == "БЛЮЗ 0225 белый"
+    item, _ = match_material(index, "ВИНТАЖ", "9999 черный")
+    assert item["material"]["name"] == "ВИНТАЖ 4268 серый"
+
+def test_same_fabric_rejects_other_fabric_and_variant():
+    index = make_index(("БЛЮЗ 0225 белый", 2), ("ВИНТАЖ 4268 серый", 0))
+    assert match_material(index, "ВИНТАЖ", "0225 белый", same_fabric=True) == (None, False)
+    assert match_material(index, "ВИНТАЖ", "9999 черный", same_fabric=True) == (None, False)
+
+def test_same_fabric_accepts_name_with_variant_and_fabric():
+    index = make_index(("БЛЮЗ 0225 белый", 2), ("ВИНТАЖ 0225 белый (new)", 1))
+    item, exact = match_material(index, "ВИНТАЖ", "0225 белый", same_fabric=True)
+    assert not exact and item["material"]["name"] == "ВИНТАЖ 0225 белый (new)"
+
+def test_find_containing_all_keeps_page_order():
+    index = make_index(*INDEX_ITEMS)
+    assert index.find_containing_all("0225", "белый")["material"]["name"] == "БЛЮЗ 0225 белый"
+    assert index.find_containing_all("0225", "альфа")["material"]["name"] == "Зебра АЛЬФА 0225 белый"
+    assert index.find_containing_all("4268", "блюз") is None
+    # Короткие части без триграмм
+    assert index.find_containing_all("02", "а")["material"]["name"] == "ВИНТАЖ 0225 белый"
+
+def test_badges_blank_for_variant_missing_in_fabric(monkeypatch):
+    index = make_index(("БЛЮЗ 0225 белый", 2), ("ВИНТАЖ 4268 серый", 0))
+    monkeypatch.setattr(amiga_data, "materials_cache", FakeMaterialsCache(index))
+
+    badges = asyncio.run(amiga_data.get_variant_badges(
+        "Рулонные шторы", "ВИНТАЖ", ["0225 белый", "4268 серый"], model_id=1))
+
+    assert badges == ["", "🔴"]
@@ -0,0 +1,142 @@
+"""
+Кэш асинхронных загрузок AsyncTTLCache: single-flight, TTL и фоновое обновление
+"""
+
+import asyncio
+
+import pytest
+
+from async_cache import AsyncTTLCache, NegativeCache
+
+class Loader:
+    """Загрузчик, считающий вызовы; ждет release, если он задан"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = 0
+        self.error = error
+        self.release = None
+
+    async def __call__(self, key):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"{key}-{self.calls}"
+
+def test_concurrent_gets_share_one_load():
+    loader = Loader()
+    cache = AsyncTTLCache("test", loader, ttl=60)
+
+    async def scenario():
+        loader.release = asyncio.Event()
+        waiters = [asyncio.ensure_future(cache.get("a")) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(scenario()) == ["a-1"] * 3
+    assert loader.calls == 1
+    assert cache.stats["misses"] == 3 and cache.stats["coalesced"] == 2
+
+def test_concurrent_gets_share_one_error():
+    loader = Loader(error=ValueError("upstream"))
+    cache = AsyncTTLCache("test", loader, ttl=60)
+
+    async def scenario():
+        loader.release = asyncio.Event()
+        waiters = [asyncio.ensure_future(cache.get("a")) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert loader.calls == 1
+    assert all(error is errors[0] and isinstance(error, ValueError) for error in errors)
+    assert cache.stats["errors"] == 3
+
+def test_error_is_not_cached():
+    loader = Loader(error=ValueError("upstream"))
+    cache = AsyncTTLCache("test", loader, ttl=60)
+    with pytest.raises(ValueError):
+        asyncio.run(cache.get("a"))
+    loader.error = None
+    assert asyncio.run(cache.get("a")) == "a-2"
+
+def test_fresh_value_is_served_from_cache():
+    loader = Loader()
+    cache = AsyncTTLCache("test", loader, ttl=60)
+
+    async def scenario():
+        return [await cache.get("a"), await cache.get("a")]
+
+    assert asyncio.run(scenario()) == ["a-1", "a-1"]
+    assert loader.calls == 1 and cache.stats["hits"] == 1
+
+def test_stale_value_is_served_and_refreshed_in_background():
+    loader = Loader()
+    cache = AsyncTTLCache("test", loader, ttl=0)
+
+    async def scenario():
+        first = await cache.get("a")
+        stale = await cache.get("a")
+        await asyncio.sleep(0.01)
+        return first, stale
+
+    assert asyncio.run(scenario()) == ("a-1", "a-1")
+    assert cache.peek("a") == "a-2"
+    assert cache.stats["stale_hits"] == 1 and cache.stats["refreshes"] == 1
+
+def test_failed_refresh_keeps_old_value():
+    loader = Loader()
+    cache = AsyncTTLCache("test", loader, ttl=0)
+
+    async def scenario():
+        await cache.get("a")
+        loader.error = ValueError("upstream")
+        stale = await cache.get("a")
+        await asyncio.sleep(0.01)
+        return stale
+
+    assert asyncio.run(scenario()) == "a-1"
+    assert cache.peek("a") == "a-1"
+    assert cache.stats["errors"] == 1
+
+def test_cancelled_waiter_does_not_cancel_load():
+    loader = Loader()
+    cache = AsyncTTLCache("test", loader, ttl=60)
+
+    async def scenario():
+        loader.release = asyncio.Event()
+        first = asyncio.ensure_future(cache.get("a"))
+        second = asyncio.ensure_future(cache.get("a"))
+        await asyncio.sleep(0)
+        first.cancel()
+        loader.release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == "a-1"
+    assert loader.calls == 1 and cache.peek("a") == "a-1"
+
+def test_prefetch_loads_once():
+    loader = Loader()
+    cache = AsyncTTLCache("test", loader, ttl=60)
+
+    async def scenario():
+        cache.prefetch("a")
+        cache.prefetch("a")
+        return await cache.get("a")
+
+    assert asyncio.run(scenario()) == "a-1"
+    assert loader.calls == 1 and cache.stats["prefetches"] == 1
+
+def test_negative_cache_expires():
+    cache = NegativeCache(ttl=60)
+    cache.add("amiga", "a")
+    assert cache.contains("amiga", "a")
+    assert not cache.contains("cortin", "a")
+    cache.discard("amiga", "a")
+    assert not cache.contains("amiga", "a")
+    expired = NegativeCache(ttl=0)
+    expired.add("amiga", "a")
+    assert not expired.contains("amiga", "a")
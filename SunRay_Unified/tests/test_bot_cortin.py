@@ -0,0 +1,79 @@
+"""
+Список полотен Cortin со значками остатков и фильтром "только в наличии"
+"""
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("dotenv")
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-TOKEN-FOR-HANDLERS")
+
+import bot
+import cortin_data
+
+FABRICS = [{'id': 1, 'name': "Альфа"}, {'id': 2, 'name': "Бета"}, {'id': 3, 'name': "Гамма"}]
+
+def patch_stock(monkeypatch, stock):
+    async def fake_stock(names, category=None, timeout=None):
+        return list(stock)
+    monkeypatch.setattr(cortin_data, "get_fabrics_stock_meters", fake_stock)
+
+def button_texts(markup) -> list:
+    return [button.text for row in markup.inline_keyboard for button in row]
+
+def button_data(markup) -> list:
+    return [button.callback_data for row in markup.inline_keyboard for button in row]
+
+def test_type_page_shows_stock_badges(monkeypatch, make_state, make_callback):
+    patch_stock(monkeypatch, [12.5, 0, None])
+    state = make_state(fabrics=FABRICS, selected_fabric_type="Блэкаут")
+    callback = make_callback("cortin_fabric_type_page_0")
+
+    asyncio.run(bot.process_cortin_fabric_type_page(callback, state))
+
+    text, markup = callback.message.edits[-1]
+    assert "Блэкаут" in text
+    texts = button_texts(markup)
+    assert "Альфа · 🟢 12.5 м" in texts
+    assert "Бета · 🔴 0 м" in texts
+    assert "Гамма" in texts
+    assert "cortin_instock_type" in button_data(markup)
+
+def test_toggle_hides_fabrics_out_of_stock(monkeypatch, make_state, make_callback):
+    patch_stock(monkeypatch, [12.5, 0, None])
+    state = make_state(fabrics=FABRICS, selected_fabric_type="Блэкаут")
+    callback = make_callback("cortin_instock_type")
+
+    asyncio.run(bot.process_cortin_instock_toggle(callback, state))
+
+    _, markup = callback.message.edits[-1]
+    assert button_data(markup)[:1] == ["cortin_fabric_final_1"]
+    assert "cortin_fabric_final_2" not in button_data(markup)
+    assert asyncio.run(state.get_data())['cortin_only_in_stock'] is True
+
+def test_filter_ignored_when_stock_unknown(monkeypatch, make_state, make_callback):
+    patch_stock(monkeypatch, [None, None, None])
+    state = make_state(fabrics=FABRICS, selected_fabric_type="Блэкаут", cortin_only_in_stock=True)
+    callback = make_callback("cortin_fabric_type_page_0")
+
+    asyncio.run(bot.process_cortin_fabric_type_page(callback, state))
+
+    text, markup = callback.message.edits[-1]
+    assert "недоступны" in text
+    data = button_data(markup)
+    assert all(f"cortin_fabric_final_{fabric['id']}" in data for fabric in FABRICS)
+    # Фильтр можно выключить, даже если остатки не загрузились
+    assert "cortin_instock_type" in data
+
+def test_fabric_page_uses_type_list(monkeypatch, make_state, make_callback):
+    patch_stock(monkeypatch, [1, 2, 3])
+    state = make_state(fabrics=FABRICS, selected_fabric_type="Блэкаут")
+    callback = make_callback("cortin_fabric_page_0")
+
+    asyncio.run(bot.process_cortin_fabric_page(callback, state))
+
+    _, markup = callback.message.edits[-1]
+    assert "Альфа · 🟢 1 м" in button_texts(markup)
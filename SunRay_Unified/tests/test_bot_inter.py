@@ -0,0 +1,67 @@
+"""
+Выбор цвета Inter: кнопка открывает именно свой товар, даже если цвета совпадают
+"""
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("dotenv")
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-TOKEN-FOR-HANDLERS")
+
+import bot
+import inter_data
+
+FABRIC_TYPE = "Ткани рулонные"
+
+CATALOG = [
+    {'name': "Скрытая", 'section': 'Нет', 'items': [{'id': 1, 'name': "Ткань `Альфа белый`"}]},
+    {'name': FABRIC_TYPE, 'section': 'Да', 'items': [
+        {'id': 10, 'name': "Ткань `Альфа белый`", 'availability_text': "В наличии"},
+        {'id': 11, 'name': "Ткань `Альфа белый`", 'availability_text': "Отсутствует"},
+        {'id': 12, 'name': "Ткань `Альфа серый`", 'availability_text': "В наличии"},
+    ]},
+]
+
+@pytest.fixture
+def catalog(monkeypatch):
+    monkeypatch.setattr(inter_data, "_catalog_data", CATALOG)
+    inter_data._create_mappings()
+    yield
+    monkeypatch.undo()
+    inter_data._create_mappings()
+
+def color_buttons(markup) -> list:
+    return [(button.text, button.callback_data) for row in markup.inline_keyboard for button in row
+            if button.callback_data.startswith("inter_color_i")]
+
+def test_color_buttons_carry_item_ids(catalog):
+    markup = bot.create_inter_colors_keyboard(FABRIC_TYPE, "", "Альфа")
+    assert color_buttons(markup) == [
+        ("белый", "inter_color_i0_0_0"),
+        ("белый", "inter_color_i0_0_1"),
+        ("серый", "inter_color_i0_0_2"),
+    ]
+
+def test_duplicate_color_opens_selected_item(catalog, make_state, make_callback):
+    state = make_state(fabric_type=FABRIC_TYPE, fabric_name="Альфа")
+    _, callback_data = color_buttons(bot.create_inter_colors_keyboard(FABRIC_TYPE, "", "Альфа"))[1]
+    callback = make_callback(callback_data)
+
+    asyncio.run(bot.process_inter_color_selection(callback, state))
+
+    text, _ = callback.message.edits[-1]
+    assert "Нет в наличии" in text
+    assert asyncio.run(state.get_data())['item_id'] == "i0_0_1"
+
+def test_unknown_item_id_shows_error(catalog, make_state, make_callback):
+    state = make_state(fabric_type=FABRIC_TYPE, fabric_name="Альфа")
+    callback = make_callback("inter_color_i9_9_9")
+
+    asyncio.run(bot.process_inter_color_selection(callback, state))
+
+    text, markup = callback.message.edits[-1]
+    assert "недоступна" in text
+    assert len(color_buttons(markup)) == 3
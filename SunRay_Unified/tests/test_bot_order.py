@@ -0,0 +1,47 @@
+"""
+Команда /order: позиции плиссе проверяются в модели своего полотна
+"""
+
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("dotenv")
+os.environ.setdefault("BOT_TOKEN", "123456:TEST-TOKEN-FOR-HANDLERS")
+
+import amiga_data
+import bot
+
+def test_plisse_positions_use_fabric_model():
+    _, fabric_to_model = bot.load_plisse_fabrics()
+    fabric, model = next(iter(fabric_to_model.items()))
+
+    items = bot.resolve_order_model_ids([
+        ("Шторы плиссе", fabric.lower(), "белый", None),
+        ("Рулонные шторы", "Альфа", "белый", None),
+    ])
+
+    assert items == [
+        ("Шторы плиссе", fabric, "белый", amiga_data.PLISSE_MODEL_IDS[model]),
+        ("Рулонные шторы", "Альфа", "белый", None),
+    ]
+
+def test_order_passes_model_ids_to_batch_lookup(monkeypatch, make_message):
+    _, fabric_to_model = bot.load_plisse_fabrics()
+    fabric, model = next(iter(fabric_to_model.items()))
+    requested = []
+
+    async def fake_batch(items):
+        requested.extend(items)
+        return [None] * len(items)
+    monkeypatch.setattr(amiga_data, "make_batch_api_request", fake_batch)
+
+    message = make_message()
+    command = SimpleNamespace(args=f"Шторы плиссе; {fabric}; белый")
+    asyncio.run(bot.cmd_order(message, command))
+
+    assert requested == [("Шторы плиссе", fabric, "белый", amiga_data.PLISSE_MODEL_IDS[model])]
+    assert "Не найдено" in message.answers[-1]
@@ -0,0 +1,96 @@
+"""
+Пул сессий Cortin (SessionPool): ротация, вывод из ротации и смена cookies
+"""
+
+import cookie_store
+from cookie_store import SESSION_MAX_AUTH_FAILURES, SessionPool
+
+def fail_auth(pool: SessionPool, name: str, times: int = SESSION_MAX_AUTH_FAILURES):
+    for _ in range(times):
+        pool.release(pool.acquire_session(name), auth_failed=True)
+
+def test_requests_rotate_between_sessions(make_session_pool):
+    pool = make_session_pool("a", "b", "c")
+    names = []
+    for _ in range(6):
+        session = pool.acquire()
+        names.append(session.name)
+        pool.release(session, latency=0.1)
+    assert names == ["a", "b", "c", "a", "b", "c"]
+
+def test_busy_session_is_skipped(make_session_pool):
+    pool = make_session_pool("a", "b")
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.name, second.name} == {"a", "b"}
+    assert first.inflight == 1 and second.inflight == 1
+
+def test_slow_session_used_only_when_fast_ones_are_busy(make_session_pool):
+    pool = make_session_pool("fast", "slow")
+    pool.release(pool.acquire_session("fast"), latency=0.1)
+    pool.release(pool.acquire_session("slow"), latency=1.0)
+
+    session = pool.acquire()
+    assert session.name == "fast"
+    pool.release(session, latency=0.1)
+    assert pool.acquire().name == "fast"
+    # Быстрая сессия занята
+    assert pool.acquire().name == "slow"
+
+def test_session_leaves_rotation_after_auth_failures(make_session_pool):
+    pool = make_session_pool("a", "b")
+    fail_auth(pool, "a", SESSION_MAX_AUTH_FAILURES - 1)
+    assert pool.sessions()["a"].healthy
+
+    fail_auth(pool, "a", 1)
+    assert not pool.sessions()["a"].healthy
+    for _ in range(3):
+        session = pool.acquire()
+        assert session.name == "b"
+        pool.release(session, latency=0.1)
+
+def test_disabled_session_returned_only_without_healthy_only(make_session_pool):
+    pool = make_session_pool("a")
+    fail_auth(pool, "a")
+    assert pool.acquire(healthy_only=True) is None
+    # Проверка, не обновлены ли cookies выведенной сессии
+    assert pool.acquire().name == "a"
+
+def test_disabled_session_returns_after_retry_timeout(monkeypatch, make_session_pool):
+    monkeypatch.setattr(cookie_store, "SESSION_RETRY_AFTER", 0)
+    pool = make_session_pool("a", "b")
+    fail_auth(pool, "a")
+    assert pool.sessions()["a"].healthy
+
+def test_success_resets_auth_failures(make_session_pool):
+    pool = make_session_pool("a")
+    fail_auth(pool, "a", SESSION_MAX_AUTH_FAILURES - 1)
+    pool.release(pool.acquire_session("a"), latency=0.2)
+    fail_auth(pool, "a", SESSION_MAX_AUTH_FAILURES - 1)
+    assert pool.sessions()["a"].healthy
+
+def test_non_auth_errors_do_not_affect_session(make_session_pool):
+    pool = make_session_pool("a")
+    pool.release(pool.acquire_session("a"))
+    session = pool.sessions()["a"]
+    assert session.auth_failures == 0 and session.latency is None and session.inflight == 0
+
+def test_new_cookies_reset_session_state(make_session_pool):
+    pool = make_session_pool("b", a={"PHPSESSID": "old"})
+    fail_auth(pool, "a")
+    fail_auth(pool, "b", 1)
+
+    pool.store.set_sessions({"a": {"PHPSESSID": "new"}, "b": {"PHPSESSID": "b"}, "c": {"PHPSESSID": "c"}})
+    sessions = pool.sessions()
+
+    assert sessions["a"].healthy and sessions["a"].auth_failures == 0
+    assert sessions["a"].cookies == {"PHPSESSID": "new"}
+    # У сессии с прежними cookies состояние сохраняется
+    assert sessions["b"].auth_failures == 1
+    assert set(sessions) == {"a", "b", "c"}
+
+def test_removed_session_leaves_pool(make_session_pool):
+    pool = make_session_pool("a", "b")
+    pool.store.set_sessions({"b": {"PHPSESSID": "b"}})
+    assert pool.acquire(exclude=["b"]) is None
+    assert pool.acquire_session("a") is None
@@ -0,0 +1,91 @@
+"""
+Вход на сайт Cortin (cortin_auth.login) против локального сервера с формой входа
+"""
+
+import asyncio
+import secrets
+
+import pytest
+from aiohttp import web
+
+from cortin_auth import CortinLoginError, login, parse_login_form
+
+USERNAME = "manager"
+PASSWORD = "secret"
+
+LOGIN_FORM = """<html><head><title>Авторизация</title>
+<meta name="csrf-param" content="_csrf"><meta name="csrf-token" content="meta-{token}">
+</head><body><form action="/site/login" method="post">
+<input type="hidden" name="_csrf" value="{token}">
+<input name="LoginForm[username]"><input type="password" name="LoginForm[password]">
+</form></body></html>"""
+
+def create_login_app() -> tuple:
+    """Сервер, повторяющий вход Cortin: CSRF-токен в форме, редирект и _identity после входа
+
+    Возвращает (приложение, список отправленных форм входа).
+    """
+    tokens = {}  # {PHPSESSID: CSRF-токен формы}
+    posts = []
+
+    async def login_page(request):
+        session_id = request.cookies.get("PHPSESSID") or secrets.token_hex(8)
+        token = tokens.setdefault(session_id, secrets.token_hex(8))
+        response = web.Response(text=LOGIN_FORM.format(token=token), content_type="text/html")
+        response.set_cookie("PHPSESSID", session_id)
+        return response
+
+    async def login_submit(request):
+        form = await request.post()
+        posts.append(dict(form))
+        session_id = request.cookies.get("PHPSESSID")
+        valid = (
+            session_id in tokens
+            and form.get("_csrf") == tokens[session_id]
+            and form.get("LoginForm[username]") == USERNAME
+            and form.get("LoginForm[password]") == PASSWORD
+        )
+        if not valid:
+            # Как на сайте: форма возвращается с ошибкой
+            return await login_page(request)
+        response = web.HTTPFound("/")
+        response.set_cookie("_identity", f"id-{session_id}")
+        raise response
+
+    app = web.Application()
+    app.router.add_get("/site/login", login_page)
+    app.router.add_post("/site/login", login_submit)
+    return app, posts
+
+async def run_with_server(app: web.Application, scenario):
+    """Запускает сервер на свободном порту и выполняет scenario(base_url)"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        host, port = runner.addresses[0][:2]
+        return await scenario(f"http://{host}:{port}")
+    finally:
+        await runner.cleanup()
+
+def test_parse_login_form_prefers_form_token():
+    assert parse_login_form(LOGIN_FORM.format(token="abc")) == ("_csrf", "abc")
+
+def test_parse_login_form_without_token():
+    with pytest.raises(CortinLoginError):
+        parse_login_form("<html><form action='/site/login'></form></html>")
+
+def test_login_returns_session_cookies():
+    app, posts = create_login_app()
+    cookies = asyncio.run(run_with_server(app, lambda base_url: login(USERNAME, PASSWORD, base_url)))
+
+    assert cookies["_identity"] == f"id-{cookies['PHPSESSID']}"
+    # Отправлены CSRF-токен формы и rememberMe
+    post = posts[-1]
+    assert post["_csrf"] and post["LoginForm[rememberMe]"] == "1"
+
+def test_login_with_wrong_password():
+    app, _ = create_login_app()
+    with pytest.raises(CortinLoginError):
+        asyncio.run(run_with_server(app, lambda base_url: login(USERNAME, "wrong", base_url)))
@@ -0,0 +1,76 @@
+"""
+Поиск материала в снимке остатков Cortin по похожему названию (StockMatchIndex)
+"""
+
+import os
+
+import pytest
+
+from cortin_data import StockMatchIndex, parse_stock_page
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "benchmarks", "fixtures", "cortin_stocks.html")
+
+ROWS = [
+    ("Лён Бежевый 143839", "20,50"),
+    ("Лён Бежевый 7442", "0"),
+    ("Тюль Молвено V01", "25"),
+    ("Тюль Белый V-01", "3"),
+    ("Репсовая лента, серая", "100"),
+    ("Лён блэкаут Бежевый 9022-21", "7"),
+    ("Полевые травы серый", "4"),
+    ("Канвас без остатка", None),
+]
+
+@pytest.fixture(scope="module")
+def fixture_rows():
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        return parse_stock_page(f.read()).rows
+
+def test_exact_name_after_normalization():
+    match = StockMatchIndex(ROWS).find_best("ЛЕН  бежевый 7442")
+    assert match == ("Лён Бежевый 7442", "0", 1.0)
+
+def test_name_without_article_matches():
+    match = StockMatchIndex(ROWS).find_best("Тюль Молвено")
+    assert match.material == "Тюль Молвено V01"
+    assert 0.6 <= match.confidence < 1.0
+
+def test_closest_name_wins():
+    match = StockMatchIndex(ROWS).find_best("Лён Бежевый")
+    assert match.material == "Лён Бежевый 7442"
+
+def test_equal_confidence_prefers_first_row():
+    rows = [("Ткань Альфа 1", "1"), ("Ткань Альфа 2", "2")]
+    assert StockMatchIndex(rows).find_best("Ткань Альфа").material == "Ткань Альфа 1"
+
+def test_hyphenated_code_equals_plain_code():
+    assert StockMatchIndex(ROWS).find_best("Тюль Белый V01").material == "Тюль Белый V-01"
+
+@pytest.mark.parametrize("query", [
+    "Тюль Молвено V02",                 # другой артикул из букв и цифр
+    "Лён блэкаут Бежевый 9022-3",       # другой артикул через дефис
+    "Лён блэкаут Серо-бежевый 9022-3",  # другие цвет и артикул
+    "Репсовая лента, белая",            # другой цвет
+    "Полевые травы бежевый",
+])
+def test_sibling_with_other_color_or_code_is_rejected(query):
+    assert StockMatchIndex(ROWS).find_best(query) is None
+
+def test_rows_without_stock_are_skipped():
+    assert StockMatchIndex(ROWS).find_best("Канвас без остатка") is None
+
+def test_min_confidence():
+    index = StockMatchIndex(ROWS)
+    assert index.find_best("Тюль Молвено", min_confidence=0.95) is None
+
+@pytest.mark.parametrize("material", [
+    "Репсовая лента, белая",
+    "Тюль Молвено V02",
+    "Лён блэкаут Серо-бежевый 9022-3",
+    "Полевые травы бежевый",
+])
+def test_missing_material_does_not_match_sibling(fixture_rows, material):
+    rows = [row for row in fixture_rows if row[0] != material]
+    assert len(rows) == len(fixture_rows) - 1
+    assert StockMatchIndex(rows).find_best(material) is None
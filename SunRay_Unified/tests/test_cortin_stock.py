@@ -0,0 +1,167 @@
+"""
+Остатки Cortin по всем типам изделий (MergedStockView) и ответы на их основе
+"""
+
+import asyncio
+
+import pytest
+
+import cortin_data
+import http_client
+from async_cache import AsyncTTLCache
+from cortin_data import MergedStockView, StockSnapshot
+
+ROWS = [
+    ("Тюль Молвено V01", "25"),
+    ("Тюль Молвено V04", "0"),
+    ("Лён Бежевый 7442", "12,5"),
+    ("Репсовая лента, серая", "100"),
+]
+
+def make_view(*rows_by_type) -> MergedStockView:
+    snapshots = {f"Тип {number}": StockSnapshot(list(rows)) for number, rows in enumerate(rows_by_type, 1)}
+    return MergedStockView(snapshots, {})
+
+def test_stock_meters_takes_largest_exact_row():
+    view = make_view(ROWS, [("Лён Бежевый 7442", "30")])
+    assert view.stock_meters("Лён Бежевый 7442") == 30.0
+    assert view.stock_meters("ЛЕН бежевый  7442") == 30.0
+
+def test_stock_meters_ignores_similar_material():
+    view = make_view(ROWS)
+    # Похожее название находится для карточки, но не для значка
+    assert view.match("Тюль Молвено")["Тип 1"].material == "Тюль Молвено V01"
+    assert view.stock_meters("Тюль Молвено") is None
+    assert view.stock_meters("Тюль Молвено V02") is None
+
+def test_badges_for_missing_variant_are_empty(monkeypatch):
+    view = make_view(ROWS)
+
+    async def fake_view(category=cortin_data.CORTIN_STOCK_CATEGORY):
+        return view
+    monkeypatch.setattr(cortin_data, "get_merged_stock_view", fake_view)
+
+    names = ["Тюль Молвено V01", "Тюль Молвено V02", "Тюль Молвено V04"]
+    assert asyncio.run(cortin_data.get_fabrics_stock_meters(names)) == [25.0, None, 0.0]
+
+def test_need_counts_only_exact_rows(monkeypatch):
+    view = make_view(ROWS, [("Тюль Молвено V04", "15")])
+
+    async def fake_view(category=cortin_data.CORTIN_STOCK_CATEGORY):
+        return view
+    monkeypatch.setattr(cortin_data, "get_merged_stock_view", fake_view)
+    monkeypatch.setattr(cortin_data, "find_variant_names",
+                        lambda query: ["Тюль Молвено V01", "Тюль Молвено V02", "Тюль Молвено V04"])
+
+    result = asyncio.run(cortin_data.find_fabrics_with_stock("Тюль Молвено", 12))
+
+    # У V02 нет своей строки: остаток V01 ему не засчитывается
+    assert result == {"variants": [("Тюль Молвено V01", 25.0), ("Тюль Молвено V04", 15.0)], "checked": 3}
+
+def test_merged_fetch_counts_one_breaker_failure(monkeypatch):
+    product_types = cortin_data.get_stock_product_types()
+    breaker = http_client.CircuitBreaker("cortin", failure_threshold=2)
+    monkeypatch.setitem(http_client._breakers, "cortin", breaker)
+
+    async def timeout():
+        raise asyncio.TimeoutError()
+
+    async def load(key):
+        return await http_client.call_upstream("cortin", timeout)
+    monkeypatch.setattr(cortin_data, "stock_snapshot_cache", AsyncTTLCache("test", load, ttl=60))
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(cortin_data.get_merged_stock_view())
+
+    assert len(product_types) > breaker.failure_threshold
+    assert breaker.stats["failures"] == 1
+    assert breaker.is_closed
+
+    # Следующее действие пользователя - новая неудача
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(cortin_data.get_merged_stock_view())
+    assert breaker.state == breaker.OPEN
+
+class FakeStockSite:
+    """Страница остатков: для сессий из not_authorized - страница авторизации"""
+
+    def __init__(self, *not_authorized):
+        self.not_authorized = set(not_authorized)
+        self.requests = []  # PHPSESSID запросов
+
+    async def fetch(self, params, cookies, min_rows=cortin_data.MIN_STOCK_ROWS):
+        self.requests.append(cookies["PHPSESSID"])
+        if cookies["PHPSESSID"] in self.not_authorized:
+            raise cortin_data.CortinAuthError("страница авторизации")
+        return StockSnapshot(ROWS)
+
+@pytest.fixture
+def stock_site(monkeypatch):
+    """Подменяет загрузку страницы, вход и выключатель Cortin; возвращает (сайт, фоновые входы)"""
+    site = FakeStockSite()
+    scheduled = []
+    monkeypatch.setattr(cortin_data, "_fetch_stock_snapshot", site.fetch)
+    monkeypatch.setattr(cortin_data, "schedule_refresh", scheduled.append)
+    monkeypatch.setitem(http_client._breakers, "cortin", http_client.CircuitBreaker("cortin"))
+    return site, scheduled
+
+def load(key=("Римские шторы", "День-Ночь")):
+    return asyncio.run(cortin_data.load_stock_snapshot(key))
+
+def test_load_fails_over_to_next_session(monkeypatch, make_session_pool, stock_site):
+    site, scheduled = stock_site
+    site.not_authorized.add("a")
+    pool = make_session_pool("a", "b")
+    monkeypatch.setattr(cortin_data, "cortin_sessions", pool)
+
+    snapshot = load()
+
+    assert len(snapshot) == len(ROWS)
+    assert site.requests == ["a", "b"]
+    assert scheduled == ["a"]
+    sessions = pool.sessions()
+    assert sessions["a"].auth_failures == 1 and sessions["b"].latency is not None
+    assert all(session.inflight == 0 for session in sessions.values())
+
+def test_load_retries_after_relogin(monkeypatch, make_session_pool, stock_site):
+    site, _ = stock_site
+    site.not_authorized.update({"a", "b"})
+    pool = make_session_pool("a", "b")
+    monkeypatch.setattr(cortin_data, "cortin_sessions", pool)
+    relogins = []
+
+    async def refresh_session(name):
+        relogins.append(name)
+        if name == "b":
+            pool.store.set_sessions({"a": {"PHPSESSID": "a"}, "b": {"PHPSESSID": "b2"}})
+    monkeypatch.setattr(cortin_data, "refresh_session", refresh_session)
+
+    snapshot = load()
+
+    assert len(snapshot) == len(ROWS)
+    assert sorted(relogins) == ["a", "b"]
+    assert site.requests[-1] == "b2"
+    # Сессия с новыми cookies начинает с чистого состояния
+    assert pool.sessions()["b"].auth_failures == 0
+
+def test_load_raises_when_all_sessions_unauthorized(monkeypatch, make_session_pool, stock_site):
+    site, _ = stock_site
+    site.not_authorized.update({"a", "b"})
+    pool = make_session_pool("a", "b")
+    monkeypatch.setattr(cortin_data, "cortin_sessions", pool)
+    relogins = []
+
+    async def refresh_session(name):
+        relogins.append(name)
+    monkeypatch.setattr(cortin_data, "refresh_session", refresh_session)
+
+    with pytest.raises(cortin_data.CortinAuthError):
+        load()
+    # Каждая сессия пробуется один раз, вход - тоже один раз
+    assert sorted(site.requests) == ["a", "b"]
+    assert sorted(relogins) == ["a", "b"]
+
+def test_load_without_sessions(monkeypatch, make_session_pool, stock_site):
+    monkeypatch.setattr(cortin_data, "cortin_sessions", make_session_pool())
+    with pytest.raises(cortin_data.CortinAuthError):
+        load()
@@ -0,0 +1,152 @@
+"""
+Выключатель поставщика (CircuitBreaker) и повторы запросов call_upstream
+"""
+
+import asyncio
+
+import aiohttp
+import pytest
+
+import http_client
+from http_client import CircuitBreaker, CircuitOpenError, call_upstream
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Выключатель поставщика "test": размыкается после 2 неудач на 60 с"""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    monkeypatch.setitem(http_client._breakers, "test", breaker)
+    return breaker
+
+class FlakyRequest:
+    """Запрос, выбрасывающий ошибки из списка, затем возвращающий "ok" """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+def call(request, retries=2):
+    return asyncio.run(call_upstream("test", request, retries=retries, base_delay=0))
+
+def connection_error():
+    return aiohttp.ClientConnectionError("connection reset")
+
+def response_error(status: int):
+    return aiohttp.ClientResponseError(None, (), status=status)
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.is_closed and breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats["rejected"] == 1
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.is_closed
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+def test_successful_probe_closes_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.allow_request()
+    breaker.record_success()
+    assert breaker.is_closed and breaker.failures == 0
+
+def test_failed_probe_opens_breaker_again():
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=0)
+    for _ in range(5):
+        breaker.record_failure()
+    breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker.stats["opened"] == 2
+
+def test_cancelled_probe_is_released():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == breaker.OPEN
+
+def test_transient_errors_are_retried(breaker):
+    request = FlakyRequest(connection_error(), response_error(503))
+    assert call(request) == "ok"
+    assert request.calls == 3
+    assert breaker.is_closed and breaker.failures == 0
+
+def test_retries_are_limited(breaker):
+    request = FlakyRequest(connection_error(), connection_error(), connection_error(), connection_error())
+    with pytest.raises(aiohttp.ClientConnectionError):
+        call(request, retries=2)
+    assert request.calls == 3
+    assert breaker.failures == 1
+
+def test_timeout_is_not_retried(breaker):
+    request = FlakyRequest(asyncio.TimeoutError())
+    with pytest.raises(asyncio.TimeoutError):
+        call(request)
+    assert request.calls == 1
+    assert breaker.failures == 1
+
+def test_client_error_is_not_upstream_failure(breaker):
+    breaker.record_failure()
+    request = FlakyRequest(response_error(404))
+    with pytest.raises(aiohttp.ClientResponseError):
+        call(request)
+    assert request.calls == 1
+    # Поставщик ответил - он доступен
+    assert breaker.failures == 0
+
+def test_open_breaker_rejects_without_request(breaker):
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            call(FlakyRequest(asyncio.TimeoutError()))
+    request = FlakyRequest()
+    with pytest.raises(CircuitOpenError):
+        call(request)
+    assert request.calls == 0
+
+def test_half_open_probe_is_not_retried(breaker):
+    breaker.reset_timeout = 0
+    breaker.record_failure()
+    breaker.record_failure()
+    request = FlakyRequest(connection_error(), connection_error())
+    with pytest.raises(aiohttp.ClientConnectionError):
+        call(request)
+    assert request.calls == 1
+    assert breaker.state == breaker.OPEN
+
+def test_successful_probe_through_call_upstream(breaker):
+    breaker.reset_timeout = 0
+    breaker.record_failure()
+    breaker.record_failure()
+    assert call(FlakyRequest()) == "ok"
+    assert breaker.is_closed
+
+def test_failure_group_counts_one_failure(breaker):
+    async def scenario():
+        with http_client.upstream_failure_group():
+            return await asyncio.gather(
+                *(call_upstream("test", FlakyRequest(asyncio.TimeoutError())) for _ in range(3)),
+                return_exceptions=True
+            )
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+    assert breaker.failures == 1 and breaker.is_closed
@@ -4,18 +4,17 @@
 Можно запускать еженедельно через cron.
 """
 
+import asyncio
 import json
 import os
-import re
 import sqlite3
 import subprocess
 from pathlib import Path
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-import time
+
+from dotenv import load_dotenv
+
+from cookie_store import CORTIN_COOKIES_FILE, write_cookies_file
+from cortin_auth import get_login_credentials, login
 
 def get_cookies_from_arc_database():
     """Получает cookies из базы данных Arc браузера"""
@@ -99,103 +98,44 @@ def get_cookies_manual_input():
         print("❌ Не все cookies введены")
         return None
 
-def get_cookies_from_browser():
-    """Получает cookies из браузера после авторизации"""
-    
-    # Настройки Chrome (для совместимости)
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    # Убрать эту строку если хотите видеть браузер
-    # chrome_options.add_argument("--headless")
+def get_cookies_via_login():
+    """Получает cookies входом на сайт по логину и паролю (CORTIN_USERNAME / CORTIN_PASSWORD)"""
+    credentials = get_login_credentials()
+    if not credentials:
+        print("❌ Не заданы CORTIN_USERNAME и CORTIN_PASSWORD")
+        return None
     
     try:
-        driver = webdriver.Chrome(options=chrome_options)
+        return asyncio.run(login(*credentials))
     except Exception as e:
-        print(f"❌ Не удалось запустить Chrome WebDriver: {e}")
-        print("Используйте ручной ввод cookies")
+        print(f"❌ Не удалось войти на сайт: {e}")
         return None
-    
-    try:
-        # Переходим на страницу авторизации
-        driver.get("https://sale.cortin.ru/site/login")
-        
-        print("Откройте браузер и авторизуйтесь на сайте...")
-        print("После авторизации нажмите Enter в консоли...")
-        input("Нажмите Enter после авторизации: ")
-        
-        # Получаем cookies
-        cookies = driver.get_cookies()
-        
-        # Извлекаем нужные cookies
-        phpsessid = None
-        identity = None
-        
-        for cookie in cookies:
-            if cookie['name'] == 'PHPSESSID':
-                phpsessid = cookie['value']
-            elif cookie['name'] == '_identity':
-                identity = cookie['value']
-        
-        if phpsessid and identity:
-            return {
-                'PHPSESSID': phpsessid,
-                '_identity': identity
-            }
-        else:
-            print("Не удалось найти необходимые cookies")
-            return None
-            
-    finally:
-        driver.quit()
 
 def update_cookies_in_file(cookies_dict):
-    """Обновляет cookies в файле cortin_data.py"""
-    
-    file_path = "cortin_data.py"
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Заменяем PHPSESSID
-    content = re.sub(
-        r'"PHPSESSID":\s*"[^"]*"',
-        f'"PHPSESSID": "{cookies_dict["PHPSESSID"]}"',
-        content
-    )
-    
-    # Заменяем _identity (экранируем специальные символы)
-    identity_escaped = cookies_dict["_identity"].replace("\\", "\\\\").replace('"', '\\"')
-    content = re.sub(
-        r'"_identity":\s*"[^"]*"',
-        f'"_identity": "{identity_escaped}"',
-        content
-    )
-    
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"Cookies обновлены в файле {file_path}")
+    """Обновляет cookies в файле cortin_cookies.json (бот перечитает его сам)"""
+    write_cookies_file(cookies_dict)
+    print(f"Cookies обновлены в файле {CORTIN_COOKIES_FILE}")
 
 def main():
     """Основная функция"""
-    print("🔄 Запуск обновления cookies для Arc браузера...")
+    print("🔄 Запуск обновления cookies Cortin...")
     
+    load_dotenv()
     new_cookies = None
     
-    # Способ 1: Попытка получить из базы данных Arc
-    print("\n1️⃣ Попытка получения cookies из базы данных Arc...")
-    new_cookies = get_cookies_from_arc_database()
+    # Способ 1: Вход на сайт по логину и паролю (работает и на сервере без браузера)
+    print("\n1️⃣ Вход на сайт по логину и паролю...")
+    new_cookies = get_cookies_via_login()
     
-    # Способ 2: Ручной ввод (если первый способ не сработал)
+    # Способ 2: Попытка получить из базы данных Arc
     if not new_cookies:
-        print("\n2️⃣ Переход к ручному вводу cookies...")
-        new_cookies = get_cookies_manual_input()
+        print("\n2️⃣ Попытка получения cookies из базы данных Arc...")
+        new_cookies = get_cookies_from_arc_database()
     
-    # Способ 3: Selenium (если доступен Chrome WebDriver)
+    # Способ 3: Ручной ввод (если другие способы не сработали)
     if not new_cookies:
-        print("\n3️⃣ Попытка получения через Selenium...")
-        new_cookies = get_cookies_from_browser()
+        print("\n3️⃣ Переход к ручному вводу cookies...")
+        new_cookies = get_cookies_manual_input()
     
     if new_cookies:
         # Обновляем файл
@@ -213,9 +153,9 @@ def main():
     else:
         print("\n❌ Не удалось получить cookies ни одним из способов")
         print("\n💡 Попробуйте:")
-        print("1. Использовать JavaScript скрипт из get_cookies_extension.js")
-        print("2. Скопировать cookies вручную из Developer Tools")
-        print("3. Установить Chrome и ChromeDriver для Selenium")
+        print("1. Задать CORTIN_USERNAME и CORTIN_PASSWORD в .env")
+        print("2. Использовать JavaScript скрипт из get_cookies_extension.js")
+        print("3. Скопировать cookies вручную из Developer Tools")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
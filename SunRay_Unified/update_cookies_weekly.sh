@@ -10,13 +10,10 @@ echo "$(date): Запуск обновления cookies" >> cookies_update.log
 # Запуск Python скрипта
 python3 update_cookies.py >> cookies_update.log 2>&1
 
-# Перезапуск бота если он запущен
+# Бот перечитывает cortin_cookies.json сам; SIGHUP применяет cookies сразу, без перезапуска
 if pgrep -f "python.*bot.py" > /dev/null; then
-    echo "$(date): Перезапуск бота" >> cookies_update.log
-    pkill -f "python.*bot.py"
-    sleep 2
-    nohup python3 bot.py > bot.log 2>&1 &
-    echo "$(date): Бот перезапущен" >> cookies_update.log
+    pkill -HUP -f "python.*bot.py"
+    echo "$(date): Боту отправлен сигнал перечитать cookies" >> cookies_update.log
 fi
 
 echo "$(date): Обновление cookies завершено" >> cookies_update.log
\ No newline at end of file